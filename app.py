@@ -1,54 +1,214 @@
-import requests
 import os
 import time
-import firebase_admin
-from firebase_admin import credentials, firestore ,auth
-from flask import Flask, request, jsonify, Response 
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS  
 import logging
-import assemblyai as aai
-import google.generativeai as genai
-from collections import defaultdict
-from datetime import datetime
-import boto3
-from botocore.exceptions import NoCredentialsError,PartialCredentialsError
-import tempfile
-import threading
+from datetime import datetime, timezone
 import json
-from threading import Thread
+import queue
+import uuid
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import wraps
 from dotenv import load_dotenv
-
+from app_logging import configure_logging, PayloadLogger, request_id_var
+from clients import ClientRegistry, lazy_module
+from completions import CompletionRegistry, STATUS_COMPLETE
+from http_client import HttpClient
+from metrics import MetricsRegistry
+from auth_cache import TokenVerifier, SigningKeyRefresher
+from bot_index import BotIndex
+from media_transfer import MediaTransfer, UploadTooLarge
+from pipeline import StageGraph
+from meeting_store import MeetingStore
+from single_flight import SingleFlight, FirestoreLease
+from jobs import JobRunner, QueueFull, FINAL_STATES, JOB_FAILED, WAITING
+from summarizer import Summarizer
+from result_cache import ResultCache, hash_text
+from status_store import create_status_store
+from transcript import api_utterances, webhook_utterances, iter_statements
+from transcription import TranscriptionTracker, transcript_result, WEBHOOK_AUTH_HEADER, STATUS_COMPLETED, STATUS_ERROR
+
+# SDKs are imported the first time a route uses them, not at cold start
+firebase_admin = lazy_module('firebase_admin')
+credentials = lazy_module('firebase_admin.credentials')
+firestore = lazy_module('firebase_admin.firestore')
+auth = lazy_module('firebase_admin.auth')
+botocore_exceptions = lazy_module('botocore.exceptions')
 
 
 app = Flask(__name__)
 
 CORS(app)
 load_dotenv()
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Set up logging: records are written by a background thread, capped in size
+# and tagged with the request id; large payloads are only sampled at DEBUG
+log_handler = configure_logging(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    fmt=os.getenv("LOG_FORMAT", "text"),
+    max_chars=int(os.getenv("LOG_MAX_MESSAGE_CHARS", 2000)),
+    queue_size=int(os.getenv("LOG_QUEUE_SIZE", 10000)),
+)
+log_payload = PayloadLogger(
+    sample_rate=float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", 0.01)),
+    max_chars=int(os.getenv("LOG_PAYLOAD_PREVIEW_CHARS", 500)),
+)
 logger = logging.getLogger(__name__)
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+
+@app.before_request
+def assign_request_id():
+    # Reuse the caller's id (load balancer, client) so logs line up across services
+    request_id = request.headers.get(REQUEST_ID_HEADER, '')[:64] or uuid.uuid4().hex
+    g.request_id_token = request_id_var.set(request_id)
+
+
+@app.after_request
+def return_request_id(response):
+    response.headers[REQUEST_ID_HEADER] = request_id_var.get()
+    return response
+
+
+@app.teardown_request
+def clear_request_id(error=None):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        request_id_var.reset(token)
+
+# Every external client is created lazily, once per process
+clients = ClientRegistry()
+
+# Process-wide metrics, served in Prometheus text format on /metrics
+metrics = MetricsRegistry()
+request_seconds = metrics.histogram('averymeet_http_request_duration_seconds',
+                                    'Time to produce a response (streamed bodies excluded)',
+                                    labels=('endpoint', 'method', 'status'))
+stage_seconds = metrics.histogram('averymeet_stage_duration_seconds',
+                                  'Uploads, transcriptions, summaries and recording transfers',
+                                  labels=('stage', 'outcome'))
+firestore_seconds = metrics.histogram('averymeet_firestore_duration_seconds',
+                                      'Firestore reads and writes on request and job paths',
+                                      labels=('op', 'outcome'))
+upstream_seconds = metrics.histogram('averymeet_upstream_request_duration_seconds',
+                                     'Upstream HTTP calls, retries included',
+                                     labels=('endpoint', 'outcome'))
+upstream_retries = metrics.counter('averymeet_upstream_retries_total',
+                                   'Upstream HTTP retries', labels=('endpoint',))
+meeting_stage_seconds = metrics.histogram('averymeet_meeting_complete_stage_duration_seconds',
+                                          'Stages of the meeting completion job', labels=('stage',))
+webhook_events = metrics.counter('averymeet_webhook_events_total',
+                                 'MeetingBaaS webhook deliveries by event and response code',
+                                 labels=('event', 'code'))
+sse_streams = metrics.gauge('averymeet_sse_streams_active', 'Open server-sent event streams',
+                            labels=('stream',))
+# Sampled when /metrics is scraped
+jobs_in_flight = metrics.gauge('averymeet_jobs_in_flight', 'Jobs being run by a worker', labels=('runner',))
+jobs_queued = metrics.gauge('averymeet_jobs_queued', 'Jobs waiting for a worker', labels=('runner',))
+completions_pending = metrics.gauge('averymeet_bot_completions_pending',
+                                    'Ended calls waiting for the complete webhook')
+log_records_dropped = metrics.gauge('averymeet_log_records_dropped',
+                                    'Log records dropped because the log writer fell behind')
+
+
+def time_firestore(op):
+    # Handed to the helper modules so their Firestore calls land in firestore_seconds
+    return firestore_seconds.time(op=op)
+
+
+def observe_upstream(endpoint, elapsed, failed, retries):
+    upstream_seconds.observe(elapsed, endpoint=endpoint, outcome='error' if failed else 'ok')
+    if retries:
+        upstream_retries.inc(retries, endpoint=endpoint)
+
+
+def create_firebase_app():
+    # Firebase credentials
+    firebase_config = {
+        "type": os.getenv("FIREBASE_TYPE"),
+        "project_id": os.getenv("FIREBASE_PROJECT_ID"),
+        "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
+        "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace("\\n", "\n"),
+        "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
+        "client_id": os.getenv("FIREBASE_CLIENT_ID"),
+        "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
+        "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
+        "auth_provider_x509_cert_url": os.getenv("FIREBASE_AUTH_PROVIDER_CERT_URL"),
+        "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_CERT_URL"),
+        "storageBucket" : os.getenv("FIRBASE_STORAGE_BUCKET_URL")
+    }
+
+    # A forked worker inherits the parent's initialized app
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+
+    # Initialize the Firebase app
+    return firebase_admin.initialize_app(credentials.Certificate(firebase_config))
+
+
+def create_firestore_client():
+    # Initialize Firestore client
+    return firestore.client(app=clients.get('firebase'))
+
+
+def create_genai_model():
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GENAI_API_KEY"))
+    return genai.GenerativeModel('gemini-1.5-flash')
+
+
+def create_assemblyai_client():
+    import assemblyai as aai
+
+    aai_api_key = os.getenv("ASSEMBLYAI_API_KEY")
+    if aai_api_key:
+        aai.settings.api_key = aai_api_key
+    else:
+        logger.error("ASSEMBLYAI_API_KEY not found.")
+    return aai
 
-# Firebase credentials
-firebase_config = {
-    "type": os.getenv("FIREBASE_TYPE"),
-    "project_id": os.getenv("FIREBASE_PROJECT_ID"),
-    "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
-    "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace("\\n", "\n"),
-    "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
-    "client_id": os.getenv("FIREBASE_CLIENT_ID"),
-    "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
-    "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
-    "auth_provider_x509_cert_url": os.getenv("FIREBASE_AUTH_PROVIDER_CERT_URL"),
-    "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_CERT_URL"),
-    "storageBucket" : os.getenv("FIRBASE_STORAGE_BUCKET_URL")
-}
-cred = credentials.Certificate(firebase_config)
 
-# Initialize the Firebase app
-firebase_admin.initialize_app(cred)
+def create_s3_client():
+    import boto3
 
-# Initialize Firestore client
-db = firestore.client()
+    # Initialize the S3 client
+    return boto3.client('s3', aws_access_key_id=AWS_ACCESS_KEY_ID,
+                        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                        region_name=AWS_REGION)
+
+
+clients.register('firebase', create_firebase_app)
+clients.register('firestore', create_firestore_client)
+clients.register('genai_model', create_genai_model)
+clients.register('assemblyai', create_assemblyai_client)
+clients.register('s3', create_s3_client)
+clients.register('meetingbaas', lambda: HttpClient(
+    API_URL, headers=API_HEADERS,
+    timeout=(5, float(os.getenv("MEETINGBAAS_TIMEOUT_S", 30))),
+    retries=int(os.getenv("MEETINGBAAS_RETRIES", 3)),
+    on_request=observe_upstream))
+clients.register('media_http', lambda: HttpClient(timeout=(10, 60), on_request=observe_upstream))
+
+db = clients.proxy('firestore')
+model = clients.proxy('genai_model')
+aai = clients.proxy('assemblyai')
+s3 = clients.proxy('s3')
+# Pooled, retrying sessions: MeetingBaaS API calls and recording downloads
+meetingbaas = clients.proxy('meetingbaas')
+media_http = clients.proxy('media_http')
+
+# Transcriptions and summaries keyed by content hash
+result_cache = ResultCache(db, max_entries=int(os.getenv("RESULT_CACHE_ENTRIES", 256)), timed=time_firestore)
+
+# Meeting summaries with their transcripts stored in chunk documents
+meeting_store = MeetingStore(db, chunk_lines=int(os.getenv("TRANSCRIPT_CHUNK_LINES", 500)))
+
+# bot_id -> user_id lookups for the webhook handler
+bot_index = BotIndex(db, timed=time_firestore)
+
+# Background workers for long-running /transcribe jobs
+job_runner = JobRunner(db, max_workers=int(os.getenv("JOB_WORKERS", 4)), timed=time_firestore)
 
 # Third-party API URL and headers
 API_URL = "https://api.meetingbaas.com/bots"
@@ -56,15 +216,26 @@ API_HEADERS = {
     "Content-Type": "application/json",
     "x-spoke-api-key": os.getenv('SPOKE_API_KEY'),
 }
-genai_api_key = os.getenv("GENAI_API_KEY")
-genai.configure(api_key=genai_api_key)
-model = genai.GenerativeModel('gemini-1.5-flash')
 
-aai_api_key = os.getenv("ASSEMBLYAI_API_KEY")
-if aai_api_key:
-    aai.settings.api_key = aai_api_key
-else:
-    print("Error: AAI_API_KEY not found.")
+# Map-reduce summaries for transcripts that do not fit one prompt
+summarizer = Summarizer(
+    model,
+    max_chunk_tokens=int(os.getenv("SUMMARY_CHUNK_TOKENS", 32000)),
+    max_workers=int(os.getenv("SUMMARY_CONCURRENCY", 4)),
+)
+
+# Consecutive turns by one speaker separated by at most this many seconds are
+# joined into one transcript line; 0 only joins overlapping turns
+TRANSCRIPT_TURN_GAP_S = float(os.getenv("TRANSCRIPT_TURN_GAP_S", 0))
+
+# AssemblyAI calls ASSEMBLYAI_WEBHOOK_URL (our /assemblyai-webhook route) when a
+# transcript finishes; without it we fall back to polling.
+transcription_tracker = TranscriptionTracker(
+    db,
+    aai,
+    webhook_url=os.getenv("ASSEMBLYAI_WEBHOOK_URL"),
+    webhook_secret=os.getenv("ASSEMBLYAI_WEBHOOK_SECRET"),
+)
 
 
 # AWS credentials
@@ -73,10 +244,24 @@ AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_BUCKET_NAME = os.getenv('AWS_BUCKET_NAME')
 AWS_REGION = os.getenv('AWS_REGION')
 
-# Initialize the S3 client
-s3 = boto3.client('s3', aws_access_key_id=AWS_ACCESS_KEY_ID,
-                  aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-                  region_name=AWS_REGION)
+# Streams meeting recordings into the bucket part by part
+media_transfer = MediaTransfer(
+    s3, AWS_BUCKET_NAME,
+    part_size=int(os.getenv("MEDIA_PART_SIZE_MB", 8)) * 1024 * 1024,
+    concurrency=int(os.getenv("MEDIA_UPLOAD_CONCURRENCY", 4)),
+    http=media_http,
+    # Comma-separated buckets MeetingBaaS stores recordings in; only these are copied server-side
+    copy_buckets=[bucket.strip() for bucket in os.getenv("MEETINGBAAS_RECORDING_BUCKETS", "").split(',')
+                  if bucket.strip()],
+)
+# /transcribe uploads: size cap and how long AssemblyAI's presigned S3 URL stays valid
+TRANSCRIBE_MAX_UPLOAD_BYTES = int(os.getenv("TRANSCRIBE_MAX_UPLOAD_MB", 2048)) * 1024 * 1024
+# Room for the multipart boundaries and form fields around the file
+TRANSCRIBE_FORM_OVERHEAD_BYTES = 1024 * 1024
+# Werkzeug refuses larger bodies before parsing (or spooling) any of them,
+# including chunked ones that announce no length
+app.config['MAX_CONTENT_LENGTH'] = TRANSCRIBE_MAX_UPLOAD_BYTES + TRANSCRIBE_FORM_OVERHEAD_BYTES
+TRANSCRIBE_URL_TTL_S = int(os.getenv("TRANSCRIBE_URL_TTL_S", 6 * 60 * 60))
 
 
 # @app.route('/signup', methods=['POST'])
@@ -133,6 +318,56 @@ s3 = boto3.client('s3', aws_access_key_id=AWS_ACCESS_KEY_ID,
 #         return jsonify({'error': str(e)}), 500
   # Change to a valid directory on your system
 
+# Decoded ID tokens are cached until they expire
+token_verifier = TokenVerifier(
+    verify=lambda id_token: auth.verify_id_token(id_token, app=clients.get('firebase')),
+    max_entries=int(os.getenv("TOKEN_CACHE_ENTRIES", 10000)))
+signing_key_refresher = SigningKeyRefresher(get_app=lambda: clients.get('firebase'))
+# Reject unauthenticated requests to user routes once the frontend sends tokens
+REQUIRE_AUTH = os.getenv("REQUIRE_AUTH", "false").lower() in ("1", "true", "yes")
+
+
+def verify_id_token(id_token):
+    # Keys are refreshed in the background from the first verification on
+    signing_key_refresher.start()
+    return token_verifier.verify_id_token(id_token)
+
+
+def requested_user_ids():
+    # Every user_id the client sent, from the query string, form and JSON body
+    user_ids = request.args.getlist('user_id') + request.form.getlist('user_id')
+    json_body = request.get_json(silent=True) if request.is_json else None
+    if isinstance(json_body, dict) and json_body.get('user_id') is not None:
+        user_ids.append(json_body['user_id'])
+    return user_ids
+
+
+def require_auth(route):
+    # Verifies the "Authorization: Bearer <ID token>" header and checks that
+    # every user_id the client sent is the token's uid. The uid is left in
+    # g.uid, which routes use in place of the user_id they were sent.
+    @wraps(route)
+    def wrapper(*args, **kwargs):
+        g.uid = None
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            if REQUIRE_AUTH:
+                return jsonify({"message": "Missing token"}), 401
+            return route(*args, **kwargs)
+
+        try:
+            g.uid = verify_id_token(header[len('Bearer '):].strip())['uid']
+        except Exception as e:
+            return jsonify({"message": "Invalid or expired token", "error": str(e)}), 401
+
+        # Routes read user_id from different places, so all of them must match
+        if any(user_id != g.uid for user_id in requested_user_ids()):
+            return jsonify({"message": "Token does not belong to this user"}), 403
+        return route(*args, **kwargs)
+
+    return wrapper
+
+
 @app.route('/verify-token', methods=['POST'])
 def verify_token():
     try:
@@ -142,8 +377,8 @@ def verify_token():
         if not id_token:
             return jsonify({"message": "Missing token"}), 400
 
-        # Verify the token using Firebase Admin SDK
-        decoded_token = auth.verify_id_token(id_token)
+        # Verify the token using Firebase Admin SDK (cached until it expires)
+        decoded_token = verify_id_token(id_token)
 
         # If token is valid, return a success response
         uid = decoded_token['uid']
@@ -153,154 +388,411 @@ def verify_token():
         # Return an error response if verification fails
         return jsonify({"message": "Invalid or expired token", "error": str(e)}), 401
 
-# Function to upload file to AWS S3
-def upload_to_s3(file_path, file_name):
+def upload_key(user_id):
+    # Server-generated, so uploads with the same file name never overwrite each
+    # other before AssemblyAI fetches them; the client's name is only stored in Firestore
+    return f"uploads/{user_id}/{uuid.uuid4().hex}.mp3"
+
+
+# Function to stream an upload to AWS S3; returns (s3 path, sha256) or (None, None)
+def upload_to_s3(stream, s3_key):
     try:
-        s3.upload_file(file_path, AWS_BUCKET_NAME, file_name)
-        logger.info(f"File {file_name} uploaded successfully to S3 bucket {AWS_BUCKET_NAME}.")
-        return f"s3://{AWS_BUCKET_NAME}/{file_name}"
-    except NoCredentialsError:
+        with stage_seconds.time(stage='s3_upload'):
+            s3_path, audio_hash = media_transfer.upload_stream(stream, s3_key, max_bytes=TRANSCRIBE_MAX_UPLOAD_BYTES)
+        logger.info(f"File {s3_key} uploaded successfully to S3 bucket {AWS_BUCKET_NAME}.")
+        return s3_path, audio_hash
+    except UploadTooLarge:
+        # Let the route answer 413
+        raise
+    except botocore_exceptions.NoCredentialsError:
         logger.error("Credentials not available.")
-        return None
+        return None, None
     except Exception as e:
-        logger.error(f"Failed to upload {file_name} to S3: {str(e)}")
-        return None
+        logger.error(f"Failed to upload {s3_key} to S3: {str(e)}")
+        return None, None
 
 # Function to generate prompt based on the meeting type
 def generate_prompt(meeting_type, transcript):
-    print(f"Generating prompt for meeting type: {meeting_type}")
     switch = {
         "interview": f"Summarize the following interview transcript:\n{transcript}",
         "meeting": f"Summarize the following meeting transcript:\n{transcript}",
         "discussion": f"Summarize the following discussion transcript:\n{transcript}"
     }
     prompt = switch.get(meeting_type, f"Summarize the following transcript:\n{transcript}")
-    print(f"Generated prompt: {prompt}")  # Print the generated prompt
+    log_payload(logger, f"Generated {meeting_type} prompt", prompt)
     return prompt
 
-def transcribe_audio(file_path):
-    print(f"Starting transcription for: {file_path}")
-    transcriber = aai.Transcriber()
-    config = aai.TranscriptionConfig(speaker_labels=True)
+def transcribe_audio(s3_key, audio_hash):
+    logger.info(f"Starting transcription for: {s3_key}")
+
+    # The same recording is only ever transcribed once
+    cached_transcription = result_cache.get('transcription', audio_hash)
+    if cached_transcription is not None:
+        logger.info(f"Transcription for {audio_hash} found in cache")
+        return {"transcription": cached_transcription}, 200
 
     # Start transcription
-    print("Starting transcription process...")
-    transcript = transcriber.transcribe(file_path, config=config)
-    print(f"Transcription started with ID: {transcript.id}")
-
-    # Poll for the transcription status
-    while transcript.status != aai.TranscriptStatus.completed and transcript.status != aai.TranscriptStatus.error:
-        print(f"Polling for status, current status: {transcript.status}")
-        time.sleep(5)
-        transcript = transcriber.get_transcript(transcript.id)
-
-    # Check for errors
-    if transcript.status == aai.TranscriptStatus.error:
-        print(f"Error in transcription: {transcript.error}")
-        return {"error": transcript.error}, 500
-
-    # Prepare the transcription result with speaker labels
-    print("Transcription completed, preparing result...")
-    result = []
-    for utterance in transcript.utterances:
-        result.append(f"Speaker {utterance.speaker}: {utterance.text}")
-    
-    print("Transcription result prepared.")
-    return {"transcription": result}, 200
+    with stage_seconds.time(stage='transcription') as timer:
+        try:
+            # AssemblyAI fetches the recording from S3 instead of us uploading it again
+            transcript = transcription_tracker.submit(media_transfer.presigned_url(s3_key, TRANSCRIBE_URL_TTL_S))
+        except RuntimeError as e:
+            timer['outcome'] = 'error'
+            return {"error": str(e)}, 500
+
+        # Wait for the webhook, polling with backoff as a fallback
+        transcript = transcription_tracker.wait(transcript.id)
+
+        # Prepare the transcription result with speaker labels
+        logger.info("Transcription completed, preparing result...")
+        result, status_code = transcript_result(transcript)
+        if status_code != 200:
+            timer['outcome'] = 'error'
+    if status_code == 200:
+        result_cache.set('transcription', audio_hash, result['transcription'])
+    return result, status_code
 
-def summarize_transcript(transcript, meeting_type):
+def summarize_transcript(statements, meeting_type='meeting'):
     try:
-        # Join the transcription list into a single string
-        merged_statements = "\n".join(transcript)
-        
-        # Generate the prompt based on meeting type
-        prompt = generate_prompt(meeting_type, merged_statements)
-        
-        # Call the Google Gemini API to get the summary
-        print("Calling Google Gemini API for summarization...")
-        response = model.generate_content(prompt)
-        summary = response.text.strip()
-        print("Summary generated successfully.")
+        # Keyed on the prompt variant and the transcript, so any change to either is a miss
+        cache_key = hash_text(generate_prompt(meeting_type, ''), *statements)
+        cached_summary = result_cache.get('summary', cache_key)
+        if cached_summary is not None:
+            logger.info("Summary found in cache.")
+            return cached_summary
+
+        # Long transcripts are chunked and summarized in parallel, then merged
+        logger.info("Calling Google Gemini API for summarization...")
+        with stage_seconds.time(stage='summarization'):
+            summary = summarizer.summarize(
+                statements,
+                lambda transcript: generate_prompt(meeting_type, transcript),
+                transcript_kind=meeting_type,
+            )
+        logger.info("Summary generated successfully.")
+        result_cache.set('summary', cache_key, summary)
         return summary
     except AttributeError as e:
-        print(f"AttributeError: {str(e)}")
+        logger.error(f"AttributeError: {str(e)}")
         return f"Error: {str(e)}"
     except Exception as e:
-        print(f"An unexpected error occurred: {str(e)}")
+        logger.error(f"An unexpected error occurred: {str(e)}")
         return f"An unexpected error occurred: {str(e)}"
 
 
+def process_upload(s3_file_path, s3_key, audio_hash, file_name, user_id, meeting_type):
+    # Runs the rest of the upload pipeline on the calling thread and returns
+    # (result, status_code) like transcribe_audio
+    logger.info("Transcribing the file...")
+    transcription_response, status_code = transcribe_audio(s3_key, audio_hash)
+
+    if status_code != 200:
+        return transcription_response, status_code
+
+    return finish_upload(user_id, file_name, s3_file_path, transcription_response['transcription'], meeting_type)
+
+
+def finish_upload(user_id, file_name, s3_file_path, transcription, meeting_type, progress=None):
+    progress = progress or (lambda stage, **fields: None)
+
+    # Generate the summary using the transcription
+    logger.info(f"Summarizing upload {file_name} as {meeting_type}")
+    progress('summarizing')
+    summary = summarize_transcript(transcription, meeting_type)
+    log_payload(logger, f"Summary for {file_name}", summary)
+
+    # Save transcription, summary, S3 file path, and timestamp to the user's uploads collection
+    progress('saving')
+    with firestore_seconds.time(op='add_upload'):
+        _, upload_ref = db.collection('users').document(user_id).collection('uploads').add({
+            'file_name': file_name,
+            's3_path': s3_file_path,
+            'transcription': transcription,
+            'summary': summary,
+            'timestamp': firestore.SERVER_TIMESTAMP  # Store the current timestamp
+        })
+
+    return {
+        "upload_id": upload_ref.id,
+        "s3_path": s3_file_path,
+        "transcription": transcription,
+        "summary": summary,
+    }, 200
+
+
+def run_transcribe_job(job, progress):
+    # First half of an async upload (the route has already streamed the file
+    # to S3): hand AssemblyAI a presigned URL, then park the job until the
+    # transcription webhook (or the fallback poller) resumes it.
+    payload = job.payload
+    s3_file_path = payload['s3_path']
+    audio_hash = payload['audio_hash']
+
+    cached_transcription = result_cache.get('transcription', audio_hash)
+    if cached_transcription is None:
+        transcript = transcription_tracker.submit(
+            media_transfer.presigned_url(payload['s3_key'], TRANSCRIBE_URL_TTL_S))
+
+    if cached_transcription is not None:
+        # Already transcribed this recording: skip AssemblyAI entirely
+        progress('transcribing', s3_path=s3_file_path)
+        result, _ = finish_upload(job.user_id, payload['file_name'], s3_file_path,
+                                  cached_transcription, payload['meeting_type'], progress)
+        return {"upload_id": result['upload_id'], "s3_path": result['s3_path']}
+
+    progress('transcribing', s3_path=s3_file_path, transcript_id=transcript.id)
+    transcription_tracker.park(transcript.id, {
+        'job_id': job.job_id,
+        'user_id': job.user_id,
+        'file_name': payload['file_name'],
+        's3_path': s3_file_path,
+        'meeting_type': payload['meeting_type'],
+        'audio_hash': audio_hash,
+    })
+    return WAITING
+
+
+def run_transcribe_finish_job(job, progress):
+    payload = job.payload
+    transcript = transcription_tracker.get(payload['transcript_id'])
+    if transcript.status not in (STATUS_COMPLETED, STATUS_ERROR):
+        # Resumed before the transcript was done: park it again for the webhook or the poller
+        context = dict(payload)
+        transcript_id = context.pop('transcript_id')
+        logger.warning(f"Transcript {transcript_id} is still {transcript.status}; parking job {job.job_id} again")
+        transcription_tracker.park(transcript_id, context)
+        return WAITING
+    transcription_response, status_code = transcript_result(transcript)
+    if status_code != 200:
+        raise RuntimeError(transcription_response.get('error', f"Transcription failed with status {status_code}"))
+    result_cache.set('transcription', payload['audio_hash'], transcription_response['transcription'])
+
+    result, _ = finish_upload(job.user_id, payload['file_name'], payload['s3_path'],
+                              transcription_response['transcription'], payload['meeting_type'], progress)
+    # The full transcript lives on the upload document; keep the job record small
+    return {"upload_id": result['upload_id'], "s3_path": result['s3_path']}
+
+
+def resume_transcribe_job(transcript_id, context):
+    try:
+        job_runner.submit('transcribe_finish', context['user_id'],
+                          dict(context, transcript_id=transcript_id), job_id=context['job_id'])
+    except QueueFull:
+        logger.error(f"Could not resume job {context['job_id']}: job queue is full")
+
+
+job_runner.register('transcribe', run_transcribe_job)
+job_runner.register('transcribe_finish', run_transcribe_finish_job)
+transcription_tracker.on_resume(resume_transcribe_job)
+
+
+@app.route('/assemblyai-webhook', methods=['POST'])
+def assemblyai_webhook():
+    # Only accepted when the shared secret is configured and matches
+    secret = transcription_tracker.webhook_secret
+    if not secret or request.headers.get(WEBHOOK_AUTH_HEADER) != secret:
+        return jsonify({"error": "Invalid webhook secret"}), 401
+
+    data = request.get_json(silent=True) or {}
+    transcript_id = data.get('transcript_id')
+    if not transcript_id:
+        return jsonify({"error": "transcript_id is required"}), 400
+
+    logger.info(f"Transcription {transcript_id} finished with status {data.get('status')}")
+    try:
+        transcription_tracker.handle_webhook(transcript_id)
+    except Exception as e:
+        logger.error(f"Failed to resume transcription {transcript_id}: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"message": "ok"}), 200
+
+
 @app.route('/transcribe', methods=['POST'])
+@require_auth
 def transcribe():
-    try:
-        print("Checking if the request contains a file...")
+    if request.mimetype == 'multipart/form-data':
+        # Werkzeug spools the file part to an anonymous temporary file, which
+        # the OS removes when the request ends, however it ends. Oversized
+        # bodies are refused before anything is spooled.
+        if (request.content_length or 0) > TRANSCRIBE_MAX_UPLOAD_BYTES + TRANSCRIBE_FORM_OVERHEAD_BYTES:
+            return jsonify({"error": f"Upload is larger than {TRANSCRIBE_MAX_UPLOAD_BYTES} bytes"}), 413
         if 'file' not in request.files:
-            print("No file part in the request.")
+            logger.info("No file part in the request.")
             return jsonify({"error": "No file part"}), 400
 
         file = request.files['file']
         if file.filename == '' or not file.filename.endswith('.mp3'):
-            print(f"Invalid file type: {file.filename}")
+            logger.info(f"Invalid file type: {file.filename}")
             return jsonify({"error": "File must be an MP3"}), 400
 
         # Get user ID from the request
-        user_id = request.form.get('user_id')
+        user_id = g.uid or request.form.get('user_id')
         if not user_id:
             return jsonify({"error": "user_id parameter is required"}), 400
 
-        # Save the file temporarily in a cross-platform way
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-            temp_file_path = temp_file.name  # Get the name of the temporary file
-            file.save(temp_file_path)
-            print(f"File saved temporarily to {temp_file_path}")
-
-        # Upload the file to AWS S3
-        s3_file_path = upload_to_s3(temp_file_path, file.filename)
+        meeting_type = request.form.get('meeting_type', 'meeting')  # Default to 'meeting' if not provided
+        run_async = request.form.get('async', '').lower() in ('1', 'true', 'yes')
+        file_name = file.filename
+        stream = file.stream
+    else:
+        # Raw body mode: the request body is the MP3 and is streamed straight to S3
+        if request.mimetype not in ('audio/mpeg', 'audio/mp3', 'application/octet-stream'):
+            return jsonify({"error": "No file part"}), 400
+        file_name = request.args.get('file_name', '')
+        if not file_name.endswith('.mp3'):
+            return jsonify({"error": "file_name must name an MP3"}), 400
+        user_id = g.uid or request.args.get('user_id')
+        if not user_id:
+            return jsonify({"error": "user_id parameter is required"}), 400
+        meeting_type = request.args.get('meeting_type', 'meeting')
+        run_async = request.args.get('async', '').lower() in ('1', 'true', 'yes')
+        stream = request.stream
 
+    try:
+        # One read of the upload: it is hashed while it is sent to S3 in parts
+        s3_key = upload_key(user_id)
+        s3_file_path, audio_hash = upload_to_s3(stream, s3_key)
         if s3_file_path is None:
             return jsonify({"error": "Failed to upload file to S3"}), 500
 
-        # Transcribe the audio file
-        print("Transcribing the file...")
-        transcription_response, status_code = transcribe_audio(temp_file_path)
+        if run_async:
+            # Hand the work to the job workers and return the job id right away
+            try:
+                job_id = job_runner.submit('transcribe', user_id, {
+                    's3_path': s3_file_path,
+                    's3_key': s3_key,
+                    'audio_hash': audio_hash,
+                    'file_name': file_name,
+                    'meeting_type': meeting_type,
+                })
+            except QueueFull:
+                return jsonify({"error": "Too many transcription jobs in progress, try again later"}), 503
+            return jsonify({"job_id": job_id, "status": "queued"}), 202
 
+        result, status_code = process_upload(s3_file_path, s3_key, audio_hash, file_name, user_id, meeting_type)
         if status_code != 200:
-            return transcription_response, status_code
+            return jsonify(result), status_code
 
-        # Generate the summary using the transcription
-        meeting_type = request.form.get('meeting_type', 'meeting')  # Default to 'meeting' if not provided
-        print(f"Received meeting type: {meeting_type}")  # Print the received meeting type
-        summary = summarize_transcript(transcription_response['transcription'], meeting_type)
-        print(f"Summary generated: {summary}")
+        return jsonify({"transcription": result['transcription'], "summary": result['summary']}), 200
 
-        # Save transcription, summary, S3 file path, and timestamp to the user's uploads collection
-        db.collection('users').document(user_id).collection('uploads').add({
-            'file_name': file.filename,
-            's3_path': s3_file_path,
-            'transcription': transcription_response['transcription'],
-            'summary': summary,
-            'timestamp': firestore.SERVER_TIMESTAMP  # Store the current timestamp
-        })
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except Exception as e:
+        logger.error(f"An error occurred: {str(e)}")
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
-        # Clean up by removing the temp file
-        print(f"Removing temporary file {temp_file_path} after processing.")
-        os.remove(temp_file_path)
 
-        return jsonify({"transcription": transcription_response['transcription'], "summary": summary}), 200
+@app.route('/jobs/<job_id>', methods=['GET'])
+@require_auth
+def get_job_status(job_id):
+    user_id = g.uid or request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'user_id parameter is required'}), 400
 
+    try:
+        status = job_runner.get_status(user_id, job_id)
+        if status is None:
+            return jsonify({'error': 'No such job!'}), 404
+        return jsonify(status), 200
     except Exception as e:
-        print(f"An error occurred: {str(e)}")
-        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+        logger.error(f"An error occurred while fetching job {job_id}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+# Job streams re-read Firestore after this long without a local update, and
+# give up after the idle timeout
+JOB_STREAM_RECHECK_S = float(os.getenv("JOB_STREAM_RECHECK_S", 30))
+JOB_STREAM_IDLE_TIMEOUT_S = float(os.getenv("JOB_STREAM_IDLE_TIMEOUT_S", 3 * 60 * 60))
+
+
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+@require_auth
+def stream_job_status(job_id):
+    user_id = g.uid or request.args.get('user_id')
+    if not user_id:
+        return jsonify({'error': 'user_id parameter is required'}), 400
+
+    def generate_job_updates():
+        with sse_streams.track(stream='job'):
+            last_version = 0
+            last_status = None
+            last_change = time.monotonic()
+            while True:
+                if time.monotonic() - last_change > JOB_STREAM_IDLE_TIMEOUT_S:
+                    yield f"data: {json.dumps({'job_id': job_id, 'status': 'timeout'})}\n\n"
+                    break
+
+                update = job_runner.wait_for_update(job_id, last_version, timeout=15, user_id=user_id)
+                if update is not None and update[0] == last_version \
+                        and time.monotonic() - last_change > JOB_STREAM_RECHECK_S:
+                    # A parked job may be resumed by the AssemblyAI callback on
+                    # another instance, which never touches this instance's state
+                    update = None
+
+                if update is None:
+                    # Job runs on another instance: fall back to reading Firestore
+                    status = job_runner.get_status(user_id, job_id)
+                    if status is None:
+                        yield f"data: {json.dumps({'error': 'No such job!'})}\n\n"
+                        break
+                    status.pop('updated_at', None)
+                    if status != last_status:
+                        last_status = status
+                        last_change = time.monotonic()
+                        yield f"data: {json.dumps(status, default=str)}\n\n"
+                    else:
+                        yield ": keep-alive\n\n"
+                    if status.get('status') in FINAL_STATES:
+                        break
+                    time.sleep(2)
+                    continue
+
+                version, state = update
+                if version == last_version:
+                    yield ": keep-alive\n\n"
+                    continue
+                last_version = version
+                last_change = time.monotonic()
+                state.pop('version', None)
+                state['job_id'] = job_id
+                yield f"data: {json.dumps(state, default=str)}\n\n"
+                if state.get('status') in FINAL_STATES:
+                    break
+
+    return Response(generate_job_updates(), mimetype='text/event-stream')
+
+# Bot statuses shared between the webhook handler and the SSE streams
+bot_status_store = create_status_store(
+    db,
+    backend=os.getenv("BOT_STATUS_STORE"),
+    ttl=int(os.getenv("BOT_STATUS_TTL_S", 6 * 60 * 60)),
+    timed=time_firestore,
+)
+
+# Bots whose call ended and that are waiting for the 'complete' webhook
+bot_completions = CompletionRegistry(timeout=float(os.getenv("BOT_COMPLETION_TIMEOUT_S", 2 * 60 * 60)))
+
+# Webhook status code -> status streamed to the client and stored in Firestore
+BOT_STREAM_STATUSES = {
+    "joining_call": "joining_call",
+    "in_waiting_room": "in_waiting_room",
+    "in_call_not_recording": "in_call_not_recording",
+    "in_call_recording": "in_call_recording",
+    "call_ended": "call ended",
+    "failed": "failed",
+    "complete": "complete",
+}
+BOT_STREAM_FINAL_STATUSES = ("call_ended", "failed", "complete")
+BOT_STREAM_HEARTBEAT_S = float(os.getenv("BOT_STREAM_HEARTBEAT_S", 15))
+BOT_STREAM_IDLE_TIMEOUT_S = float(os.getenv("BOT_STREAM_IDLE_TIMEOUT_S", 3 * 60 * 60))
 
-# Store the event and bot status
-bot_status_event = {}
-bot_status_data = {}
 
 @app.route('/start-meeting-bot', methods=['POST'])
+@require_auth
 def start_meeting_bot():
     data = request.json
     meeting_url = data.get('meeting_url')
-    user_id = data.get('user_id')  # Get the user_id from the request
+    user_id = g.uid or data.get('user_id')  # Get the user_id from the request
 
     if not meeting_url or not user_id:
         return jsonify({"error": "Meeting URL and user_id are required"}), 400
@@ -317,7 +809,7 @@ def start_meeting_bot():
 
     try:
         # Make the initial request to start the bot
-        response = requests.post(API_URL, json=config, headers=API_HEADERS)
+        response = meetingbaas.post(json=config, endpoint='POST /bots')
         response_data = response.json()
 
         if response.status_code == 200:
@@ -325,82 +817,61 @@ def start_meeting_bot():
             if bot_id:
                 user_ref = db.collection('users').document(user_id)
                 bot_ref = user_ref.collection('bots').document(bot_id)
-                bot_ref.set({
-                    "bot_id": bot_id,
-                    "meetingUrl": meeting_url,
-                    "timestamp": firestore.SERVER_TIMESTAMP
-                })
-                bot_status_event[bot_id] = threading.Event()
-                bot_status_data[bot_id] = {"status": None, "created_at": None}
+                with firestore_seconds.time(op='set_bot'):
+                    bot_ref.set({
+                        "bot_id": bot_id,
+                        "meetingUrl": meeting_url,
+                        "timestamp": firestore.SERVER_TIMESTAMP
+                    })
+                bot_index.register(bot_id, user_id)
+                bot_status_store.register(bot_id)
 
                 # Create a Firestore collection for this bot
                 bot_collection_ref = db.collection('users').document(user_id).collection('bots').document(bot_id)
 
-                def generate_status_updates():
-                    yield f"data: {json.dumps({'bot_id': bot_id})}\n\n"
-                    while True:
-                        # Get the current status from bot_status_data
-                        current_status = bot_status_data[bot_id].get("status")
-                        timestamp = firestore.SERVER_TIMESTAMP  # Use server timestamp for Firebase
-
-                        # Prepare the status update
-                        if current_status in ["call_ended"]:
-                            status_message = "call ended"
-                            yield f"data: {json.dumps({'status': status_message})}\n\n"
-                            bot_collection_ref.set({
-                                "status": "call ended",
-                            }, merge=True)
-
-                            # Start a separate thread to check for event completion
-                            Thread(target=check_event_completion, args=(bot_id,user_id)).start()
-                            break
-                        elif current_status in ["failed"]:
-                            status_message = "failed"
-                            yield f"data: {json.dumps({'status': status_message})}\n\n"
-                            # Update Firestore
-                            bot_collection_ref.set({
-                                "status": "failed",
-                            }, merge=True)
-                            break
-
-                        elif current_status in ["in_call_recording"]:
-                            status_message = "in_call_recording"
-                            yield f"data: {json.dumps({'status': status_message})}\n\n"
-                            # Update Firestore
-                            bot_collection_ref.set({
-                                "status": "in_call_recording",
-                            }, merge=True)
-
-                        elif current_status in ["in_call_not_recording"]:
-                            status_message = "in_call_not_recording"
-                            yield f"data: {json.dumps({'status': status_message})}\n\n"
-                            # Update Firestore
-                            bot_collection_ref.set({
-                                "status": "in_call_not_recording",
-                            }, merge=True)
+                # Subscribe before returning so no webhook is missed while the stream starts
+                subscriber = bot_status_store.subscribe(bot_id)
+                with firestore_seconds.time(op='set_bot_status'):
+                    bot_collection_ref.set({"status": "waiting"}, merge=True)
 
-                        elif current_status in ["in_waiting_room"]:
-                            status_message = "in_waiting_room"
-                            yield f"data: {json.dumps({'status': status_message})}\n\n"
-                            # Update Firestore
-                            bot_collection_ref.set({
-                                "status": "in_waiting_room",
-                            }, merge=True)
+                def generate_status_updates():
+                    sse_streams.inc(stream='bot')
+                    try:
+                        yield f"data: {json.dumps({'bot_id': bot_id})}\n\n"
+                        last_status = None
+                        idle_since = time.monotonic()
+                        while True:
+                            # Block until the webhook publishes a status, sending heartbeats meanwhile
+                            try:
+                                current_status = subscriber.get(timeout=BOT_STREAM_HEARTBEAT_S)
+                            except queue.Empty:
+                                if time.monotonic() - idle_since > BOT_STREAM_IDLE_TIMEOUT_S:
+                                    yield f"data: {json.dumps({'status': 'timeout'})}\n\n"
+                                    break
+                                yield ": heartbeat\n\n"
+                                continue
+
+                            status_message = BOT_STREAM_STATUSES.get(current_status)
+                            if status_message is None or current_status == last_status:
+                                continue
+                            last_status = current_status
+                            idle_since = time.monotonic()
 
-                        elif current_status in ["joining_call"]:
-                            status_message = "joining_call"
                             yield f"data: {json.dumps({'status': status_message})}\n\n"
-                            # Update Firestore
-                            bot_collection_ref.set({
-                                "status": "joining_call",
-                            }, merge=True)
-
-                        else:
-                            bot_collection_ref.set({
-                                "status": "waiting",
-                            }, merge=True)
-
-                        time.sleep(2)  # Delay before checking again
+                            # Update Firestore only when the status actually changes
+                            with firestore_seconds.time(op='set_bot_status'):
+                                bot_collection_ref.set({
+                                    "status": status_message,
+                                }, merge=True)
+
+                            if current_status == "call_ended":
+                                # The webhook's complete/failed branch settles the bot; the reaper handles bots that never do
+                                bot_completions.expect(bot_id, bot_completion_callback(bot_id, user_id))
+                            if current_status in BOT_STREAM_FINAL_STATUSES:
+                                break
+                    finally:
+                        subscriber.close()
+                        sse_streams.dec(stream='bot')
 
                 return Response(generate_status_updates(), mimetype='text/event-stream')
             else:
@@ -411,39 +882,45 @@ def start_meeting_bot():
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
-def check_event_completion(bot_id ,user_id):
-    # Wait for the event to complete and then update Firestore
+def bot_completion_callback(bot_id, user_id):
     bot_collection_ref = db.collection('users').document(user_id).collection('bots').document(bot_id)
-    while True:
-        current_status = bot_status_data[bot_id].get("status")
-        if current_status == "complete":
-            # Assume here that the event is complete right after the call ends
-            # Update Firestore with the completion status
+
+    def on_completion(status):
+        if status == STATUS_COMPLETE:
+            # Already written in the same batch as the meeting summary
+            return
+        # A timeout here may just mean another worker handled the complete webhook
+        with firestore_seconds.time(op='get_bot'):
+            bot_doc = bot_collection_ref.get()
+        if (bot_doc.to_dict() or {}).get("status") == STATUS_COMPLETE:
+            return
+        logger.warning(f"Marking bot {bot_id} as {status}")
+        with firestore_seconds.time(op='set_bot_status'):
             bot_collection_ref.set({
-                "status": "complete",
+                "status": status,
             }, merge=True)
-            break
-        time.sleep(2)
+
+    return on_completion
 
 @app.route('/remove-meeting-bot', methods=['DELETE'])
+@require_auth
 def remove_meeting_bot():
     data = request.json
     bot_id = data.get('bot_id')  # Get bot_id from request body 
+    user_id = g.uid or data.get('user_id')
 
-    if not bot_id:
-        return jsonify({"error": "bot_id parameter is required"}), 400
+    if not bot_id or not user_id:
+        return jsonify({"error": "bot_id and user_id parameters are required"}), 400
     
 
     try:
-        
-        
-        url = f"{API_URL}/{bot_id}"
-        headers = {
-            "Content-Type": "application/json",
-            "x-spoke-api-key": API_HEADERS["x-spoke-api-key"]
-        }
+        # Only the user who started the bot may remove it
+        with firestore_seconds.time(op='get_bot'):
+            bot_doc = db.collection('users').document(user_id).collection('bots').document(bot_id).get()
+        if not bot_doc.exists:
+            return jsonify({"error": "No such bot document!"}), 404
 
-        response = requests.delete(url, headers=headers)
+        response = meetingbaas.delete(bot_id, endpoint='DELETE /bots/{bot_id}')
         
         if response.status_code == 200:
             return jsonify({"message": "Bot removed successfully"}), 200
@@ -455,10 +932,62 @@ def remove_meeting_bot():
         return jsonify({"error": "An error occurred while removing the bot", "details": str(e)}), 500
 
     
+# List views return pages of small projected documents instead of whole collections
+LIST_PAGE_SIZE = 20
+LIST_MAX_PAGE_SIZE = 100
+MEETING_LIST_FIELDS = ['bot_id', 'meetingUrl', 'status', 'timestamp']
+UPLOAD_LIST_FIELDS = ['file_name', 'status', 'timestamp']
+
+
+def wants_page():
+    return any(arg in request.args for arg in ('limit', 'start_after', 'fields', 'order'))
+
+
+def list_page(collection_ref, default_fields):
+    # Returns {'items': [...], 'next_cursor': id or None} for the request's
+    # limit/start_after/order/fields query parameters. Raises ValueError on bad input.
+    try:
+        limit = int(request.args.get('limit', LIST_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    limit = min(limit, LIST_MAX_PAGE_SIZE)
+
+    fields = request.args.get('fields')
+    fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else default_fields
+    if 'timestamp' not in fields:
+        fields.append('timestamp')
+
+    direction = firestore.Query.ASCENDING if request.args.get('order') == 'asc' else firestore.Query.DESCENDING
+    # Fetch one extra document to know whether there is a next page
+    query = collection_ref.order_by('timestamp', direction=direction).select(fields).limit(limit + 1)
+
+    start_after = request.args.get('start_after')
+    if start_after:
+        # start_after only needs the ordering field, not the whole document
+        cursor_doc = collection_ref.document(start_after).get(field_paths=['timestamp'])
+        if not cursor_doc.exists:
+            raise ValueError("start_after does not match any document")
+        query = query.start_after(cursor_doc)
+
+    with firestore_seconds.time(op='list_page'):
+        docs = list(query.stream())
+    items = []
+    for doc in docs[:limit]:
+        item = doc.to_dict()
+        item['id'] = doc.id
+        items.append(item)
+
+    next_cursor = docs[limit - 1].id if len(docs) > limit else None
+    return {'items': items, 'next_cursor': next_cursor}
+
+
 @app.route('/meetings', methods=['POST'])
+@require_auth
 def get_user_meetings():
     try:
-        user_id = request.args.get('user_id')  # Get the user_id from the request
+        user_id = g.uid or request.args.get('user_id')  # Get the user_id from the request
 
         # Validate that user_id is provided
         if not user_id:
@@ -468,16 +997,28 @@ def get_user_meetings():
         user_ref = db.collection('users').document(user_id)
 
         # Check if the user document exists
-        user_doc = user_ref.get()
+        with firestore_seconds.time(op='get_user'):
+            user_doc = user_ref.get()
         if not user_doc.exists:
             return jsonify({'error': 'User does not exist!'}), 404
 
         # Reference to the 'bots' collection under the user's document
         meetings_ref = user_ref.collection('bots')
+
+        # Paginated, projected listing when the client asks for it
+        if wants_page():
+            try:
+                page = list_page(meetings_ref, list(MEETING_LIST_FIELDS))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            logger.info("Meetings page retrieved successfully")
+            return jsonify(page), 200
+
         meetings = []
 
         # Fetch all meeting summaries for the user
-        docs = meetings_ref.stream()
+        with firestore_seconds.time(op='list_all'):
+            docs = list(meetings_ref.stream())
 
         for doc in docs:
             meeting_data = doc.to_dict()
@@ -492,7 +1033,21 @@ def get_user_meetings():
         return jsonify({'error': str(e)}), 500
 
 
+# /meeting_data misses are computed once per bot: SingleFlight joins requests
+# on this instance, the lease in meeting_data_leases/{user_id}:{bot_id} makes
+# other instances wait for the summary instead of building their own
+# The holder renews its lease while it works, so the ttl only bounds how long
+# a crashed holder blocks others. Waiters give up after MEETING_DATA_WAIT_S,
+# which covers a slow MeetingBaaS fetch with retries plus the summary.
+MEETING_DATA_LEASE_TTL_S = float(os.getenv("MEETING_DATA_LEASE_TTL_S", 120))
+MEETING_DATA_WAIT_S = float(os.getenv("MEETING_DATA_WAIT_S", 300))
+MEETING_DATA_POLL_S = float(os.getenv("MEETING_DATA_POLL_S", 0.5))
+meeting_data_flight = SingleFlight()
+meeting_data_leases = FirestoreLease(db, 'meeting_data_leases', ttl=MEETING_DATA_LEASE_TTL_S)
+
+
 @app.route('/meeting_data', methods=['GET'])
+@require_auth
 def get_meeting_data():
     bot_id = request.args.get('bot_id')
 
@@ -501,183 +1056,270 @@ def get_meeting_data():
         return jsonify({'error': 'bot_id parameter is required'}), 400
 
     # Update the reference to get the correct bot document under the user's collection
-    user_id = request.args.get('user_id')  # Get user_id as well to fetch the correct bot
+    user_id = g.uid or request.args.get('user_id')  # Get user_id as well to fetch the correct bot
     if not user_id:
         return jsonify({'error': 'user_id parameter is required'}), 400
 
     bot_doc_ref = db.collection('users').document(user_id).collection('bots').document(bot_id)
-    bot_doc = bot_doc_ref.get()
+    with firestore_seconds.time(op='get_bot'):
+        bot_doc = bot_doc_ref.get()
 
     if not bot_doc.exists:
         logger.error("No such bot document!")
         return jsonify({'error': 'No such bot document!'}), 404
 
-    bot_data = bot_doc.to_dict()
-    meeting_data = {}
-    meeting_datas = []
+    try:
+        body, status_code = meeting_data_result(user_id, bot_id, bot_doc_ref, bot_doc.to_dict())
+    except Exception as e:
+        logger.error(f"An error occurred while retrieving meeting data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    return jsonify(body), status_code
+
 
+def meeting_data_result(user_id, bot_id, bot_doc_ref, bot_data):
+    # /meeting_data's answer for an existing bot as (body, status code)
     # Check if the 'meeting_summary' subcollection exists and has documents
-    meetings_ref = bot_doc_ref.collection('meeting_summary')
-    meetings_docs = meetings_ref.stream()
-    meetings_list = [doc.to_dict() for doc in meetings_docs]
-
+    meetings_list = load_meeting_summaries(bot_doc_ref)
     if meetings_list:
         # Meetings data found in Firestore
         logger.info(f"Meetings data found for bot_id {bot_id} in Firestore")
-        return jsonify({'bot_data': bot_data, 'meeting_summary': meetings_list}), 200
+        return {'bot_data': bot_data, 'meeting_summary': meetings_list}, 200
+
+    # Concurrent misses for the same bot share one API call and summary
+    return meeting_data_flight.do(
+        f"{user_id}/{bot_id}",
+        lambda: build_meeting_data(user_id, bot_id, bot_doc_ref, bot_data),
+    )
+
+
+def load_meeting_summaries(bot_doc_ref):
+    with firestore_seconds.time(op='load_meeting_summaries'):
+        return [meeting_store.load(doc) for doc in bot_doc_ref.collection('meeting_summary').stream()]
+
+
+def build_meeting_data(user_id, bot_id, bot_doc_ref, bot_data):
+    # Returns (body, status code). Only the instance holding the bot's lease
+    # calls MeetingBaaS; the others wait for the summary it saves.
+    lease_key = f"{user_id}:{bot_id}"
+    deadline = time.monotonic() + MEETING_DATA_WAIT_S
+    while True:
+        token = meeting_data_leases.acquire(lease_key)
+        if token is not None:
+            break
+        if time.monotonic() >= deadline:
+            return {'error': 'Meeting data is still being prepared, try again later'}, 503
+        time.sleep(MEETING_DATA_POLL_S)
+        meetings_list = load_meeting_summaries(bot_doc_ref)
+        if meetings_list:
+            logger.info(f"Meetings data for bot_id {bot_id} saved by another instance")
+            return {'bot_data': bot_data, 'meeting_summary': meetings_list}, 200
+
+    try:
+        # The previous holder may have saved it between our read and the lease
+        meetings_list = load_meeting_summaries(bot_doc_ref)
+        if meetings_list:
+            return {'bot_data': bot_data, 'meeting_summary': meetings_list}, 200
+        with meeting_data_leases.hold(lease_key, token):
+            return fetch_meeting_data(user_id, bot_id, bot_doc_ref, bot_data)
+    finally:
+        meeting_data_leases.release(lease_key, token)
+
 
+def fetch_meeting_data(user_id, bot_id, bot_doc_ref, bot_data):
     # If no data in Firestore, call the third-party API
-    url = "https://api.meetingbaas.com/bots/meeting_data"
     params = {'bot_id': bot_id}
-    headers = {
-        "Content-Type": "application/json",
-        "x-spoke-api-key": API_HEADERS["x-spoke-api-key"]
+    response = meetingbaas.get('meeting_data', params=params, endpoint='GET /bots/meeting_data')
+
+    if response.status_code != 200:
+        logger.error("Failed to retrieve meeting data from API")
+        return {'error': 'Failed to retrieve meeting data from API'}, response.status_code
+
+    meeting_data = response.json()
+    log_payload(logger, f"Meeting data for bot {bot_id}", meeting_data)
+
+    # Extract necessary data
+    mp4_url = meeting_data['assets'][0]['mp4_s3_path']
+    attendees = meeting_data['attendees']
+    logger.info(f"Meeting data for bot {bot_id}: {len(attendees)} attendees, recording {mp4_url}")
+
+    # Extract transcription and summary
+    merged_statements = list(iter_statements(api_utterances(meeting_data), TRANSCRIPT_TURN_GAP_S))
+
+    # Summarize the transcript
+    summary = summarize_transcript(merged_statements)
+    log_payload(logger, f"Summary for bot {bot_id}", summary)
+
+    # Prepare the meeting_summary object with attendees, transcription, summary, and mp4_url
+    meeting_summary = {
+        'attendees': attendees,
+        'transcription': merged_statements,
+        'summary': summary,
+        'mp4_url': mp4_url
     }
 
+    # Store the summary data in Firestore
+    meeting_summary_firebase = dict(meeting_summary, timestamp=firestore.SERVER_TIMESTAMP)
+    save_meeting_summary(user_id, bot_id, bot_doc_ref, meeting_summary_firebase)  # Save to Firestore
+
+    return {'bot_data': bot_data, 'meeting_summary': meeting_summary}, 200
+
+
+# The dashboard's meetings in one round-trip: one get_all for the bot
+# documents, then each bot's summaries on a bounded pool
+MEETING_DATA_BATCH_MAX = int(os.getenv("MEETING_DATA_BATCH_MAX", 100))
+MEETING_DATA_BATCH_WORKERS = int(os.getenv("MEETING_DATA_BATCH_WORKERS", 8))
+
+
+def batch_meeting_data_entry(user_id, bot_doc):
+    # One line of the batch response; carries its own status like /meeting_data would
+    if not bot_doc.exists:
+        return {'bot_id': bot_doc.id, 'status': 404, 'error': 'No such bot document!'}
     try:
-        response = requests.get(url, headers=headers, params=params)
+        body, status_code = meeting_data_result(user_id, bot_doc.id, bot_doc.reference, bot_doc.to_dict())
+    except Exception as e:
+        logger.error(f"An error occurred while retrieving meeting data for {bot_doc.id}: {str(e)}")
+        body, status_code = {'error': str(e)}, 500
+    return dict(body, bot_id=bot_doc.id, status=status_code)
 
-        if response.status_code == 200:
-            meeting_data = response.json()
-            meeting_datas = response.json()
-            print(meeting_datas)
-
-            # Extract necessary data
-            mp4_url = meeting_datas['assets'][0]['mp4_s3_path']
-            print(mp4_url)
-            attendees = meeting_datas['attendees']
-            for attendee in attendees:
-                print(f"Attendee: {attendee['name']}")
-
-            # Extract transcription and summary
-            def extract_speaker_statements(meeting_data):
-                editors = meeting_data.get('editors', [])
-                speaker_transcripts = defaultdict(lambda: defaultdict(list))
-                for editor in editors:
-                    video = editor.get('video', {})
-                    transcripts = video.get('transcripts', [])
-                    for transcript in transcripts:
-                        speaker = transcript.get('speaker')
-                        words = transcript.get('words', [])
-                        if not words:
-                            continue
-                        start_time = words[0].get('start_time', 0.0)
-                        text = ' '.join(word.get('text') for word in words if word.get('text')).strip()
-                        speaker_transcripts[speaker][start_time].append(text)
-                speaker_statements = []
-                for speaker, timestamps in speaker_transcripts.items():
-                    for start_time, texts in sorted(timestamps.items()):
-                        full_statement = ' '.join(texts).strip()
-                        speaker_statements.append(f"from {start_time:.2f}s {speaker} : {full_statement}")
-                return speaker_statements
-
-            def merge_statements(statements):
-                merged_statements = []
-                speaker_lines = defaultdict(list)
-
-                for statement in statements:
-                    parts = statement.split(' : ', 1)
-                    if len(parts) < 2:
-                        continue  # Skip malformed statements
-                    timestamp_and_speaker = parts[0].split(' ', 2)
-                    if len(timestamp_and_speaker) < 3:
-                        continue  # Skip malformed timestamp and speaker part
-                    timestamp = timestamp_and_speaker[1]  # Extract timestamp
-                    speaker = timestamp_and_speaker[2]    # Extract speaker name
-                    text = parts[1].strip()               # The actual text spoken
-                    speaker_lines[(timestamp, speaker)].append(text)
-
-                for (timestamp, speaker), texts in sorted(speaker_lines.items()):
-                    full_statement = ' '.join(texts).strip()
-                    merged_statements.append(f"{speaker} at {timestamp}s :- {full_statement}")
-
-                return merged_statements
-
-            speaker_statements = extract_speaker_statements(meeting_data)
-            merged_statements = merge_statements(speaker_statements)
-
-            # Summarize the transcript
-            def summarize_transcript(statement):
-                try:
-                    transcript = "\n".join(statement)
-                    prompt = f"Summarize the following meeting transcript:\n{transcript}"
-                    response = model.generate_content(prompt)
-                    summary = response.text.strip()
-                    return f"{summary}"
-                except AttributeError as e:
-                    return f"Error: {str(e)}"
-                except Exception as e:
-                    return f"An unexpected error occurred: {str(e)}"
-
-            summary = summarize_transcript(merged_statements)
-            print(summary)
-
-            # Prepare the meeting_summary object with attendees, transcription, summary, and mp4_url
-            meeting_summary = {
-                'attendees': attendees,
-                'transcription': merged_statements,
-                'summary': summary,
-                'mp4_url': mp4_url
-            }
-            # Extract necessary data and process it as you did before...
-
-            # Store the summary data in Firestore
-            meeting_summary_firebase = {
-                'attendees': attendees,
-                'transcription': merged_statements,
-                'summary': summary,
-                'mp4_url': mp4_url,
-                'timestamp': firestore.SERVER_TIMESTAMP,
-            }
-            bot_doc_ref.collection('meeting_summary').add(meeting_summary_firebase)  # Save to Firestore
-
-            return jsonify({'bot_data': bot_data, 'meeting_summary': meeting_summary}), 200
-        else:
-            logger.error("Failed to retrieve meeting data from API")
-            return jsonify({'error': 'Failed to retrieve meeting data from API'}), response.status_code
 
+def iter_batch_meeting_data(user_id, bot_ids):
+    # Yields entries as they finish, so a streamed response starts with the fastest bots
+    bots_ref = db.collection('users').document(user_id).collection('bots')
+    with firestore_seconds.time(op='get_bots'):
+        bot_docs = list(db.get_all([bots_ref.document(bot_id) for bot_id in bot_ids]))
+
+    # Each entry runs in a copy of the request's context so its logs keep the request id
+    with ThreadPoolExecutor(max_workers=min(MEETING_DATA_BATCH_WORKERS, len(bot_docs)),
+                            thread_name_prefix="meeting-data-batch") as executor:
+        futures = [executor.submit(contextvars.copy_context().run, batch_meeting_data_entry, user_id, bot_doc)
+                   for bot_doc in bot_docs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+@app.route('/meeting_data/batch', methods=['POST'])
+@require_auth
+def get_meeting_data_batch():
+    # {"user_id": ..., "bot_ids": [...]} -> {"meetings": [...]} in bot_ids order, or
+    # one JSON line per bot in completion order with ?stream=1 or Accept: application/x-ndjson
+    data = request.get_json(silent=True) or {}
+    user_id = g.uid or data.get('user_id')
+    bot_ids = data.get('bot_ids')
+    if not user_id:
+        return jsonify({'error': 'user_id parameter is required'}), 400
+    if not isinstance(bot_ids, list) or not bot_ids or not all(isinstance(bot_id, str) and bot_id for bot_id in bot_ids):
+        return jsonify({'error': 'bot_ids must be a non-empty list of bot ids'}), 400
+    # Duplicates are answered once
+    bot_ids = list(dict.fromkeys(bot_ids))
+    if len(bot_ids) > MEETING_DATA_BATCH_MAX:
+        return jsonify({'error': f'At most {MEETING_DATA_BATCH_MAX} bot_ids per request'}), 400
+
+    stream = (request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+              or request.accept_mimetypes.best == 'application/x-ndjson')
+    if stream:
+        def generate_lines():
+            for entry in iter_batch_meeting_data(user_id, bot_ids):
+                # Same encoding as jsonify, timestamps included
+                yield app.json.dumps(entry) + "\n"
+
+        return Response(generate_lines(), mimetype='application/x-ndjson')
+
+    try:
+        entries = {entry['bot_id']: entry for entry in iter_batch_meeting_data(user_id, bot_ids)}
     except Exception as e:
         logger.error(f"An error occurred while retrieving meeting data: {str(e)}")
         return jsonify({'error': str(e)}), 500
+    return jsonify({'meetings': [entries[bot_id] for bot_id in bot_ids]}), 200
     
     
 # if __name__ == '__main__':
 #     app.run(host='192.168.29.46', port=5000, debug=True)
 
-@app.route('/last_meeting_summary', methods=['POST'])
-def get_last_meeting_summary():
-    data = request.get_json()  # Retrieve the JSON body
-    user_id = data.get('user_id')  # Extract user_id from the JSON body
+def latest_summary_ref(user_id):
+    # users/{user_id}/latest/meeting_summary holds a copy of the newest meeting summary
+    return meeting_store.latest_ref(user_id)
 
-    if not user_id:
-        logger.error("user_id parameter is required")
-        return jsonify({'error': 'user_id parameter is required'}), 400
 
-    # Fetch all bots for the user
-    bots_ref = db.collection('users').document(user_id).collection('bots')
-    bots_docs = bots_ref.stream()
+def save_meeting_summary(user_id, bot_id, bot_doc_ref, meeting_summary_firebase, status=None):
+    # One batch: the summary, its transcript chunks, the latest-summary copy
+    # and (when given) the bot's new status
+    summary = dict(meeting_summary_firebase)
+    transcription = summary.pop('transcription', [])
+    with firestore_seconds.time(op='save_meeting_summary'):
+        return meeting_store.save(user_id, bot_id, bot_doc_ref, summary, transcription, status=status)
+
 
-    latest_meeting_summary = None
+def find_latest_meeting_summary(user_id):
+    # Fallback for when the latest-summary copy is missing: one ordered,
+    # limited collection-group query. The result is written back so the next
+    # call is a single read.
+    from google.api_core.exceptions import FailedPrecondition
+
+    try:
+        latest_doc = meeting_store.find_latest(user_id)
+    except FailedPrecondition as e:
+        # The composite index in firestore.indexes.json has not been deployed (or is still building)
+        logger.error(f"Latest-summary query needs its collection-group index, using the per-bot scan: {str(e)}")
+        latest_doc = None
+    if latest_doc is not None:
+        latest_bot_id = latest_doc.to_dict().get('bot_id')
+    else:
+        latest_doc, latest_bot_id = find_latest_legacy_meeting_summary(user_id)
+
+    if latest_doc is None:
+        return None
+    latest_meeting_summary = dict(latest_doc.to_dict(), bot_id=latest_bot_id, summary_id=latest_doc.id)
+    transcription = latest_meeting_summary.pop('transcription', None)
+    latest_summary_ref(user_id).set(latest_meeting_summary)
+    if transcription is not None:
+        return dict(latest_meeting_summary, transcription=transcription)
+    return meeting_store.with_transcript(latest_meeting_summary, latest_doc.reference)
+
+
+def find_latest_legacy_meeting_summary(user_id):
+    # Summaries written before they carried user_id are invisible to the
+    # collection-group query: one ordered, limited query per bot. Runs at most
+    # once per such user, since the result becomes the latest-summary copy.
+    latest_doc = None
+    latest_bot_id = None
     latest_timestamp = 0
 
-    # Iterate through each bot to find the latest meeting summary
-    for bot_doc in bots_docs:
-        meetings_ref = bot_doc.reference.collection('meeting_summary')
-        meetings_docs = meetings_ref.stream()
-        meetings_list = [doc.to_dict() for doc in meetings_docs]
+    bots_ref = db.collection('users').document(user_id).collection('bots')
+    for bot_doc in bots_ref.select([]).stream():
+        newest = (bot_doc.reference.collection('meeting_summary')
+                  .order_by('timestamp', direction=firestore.Query.DESCENDING)
+                  .limit(1).stream())
+        for doc in newest:
+            meeting = doc.to_dict()
+            # Convert timestamp to a comparable format
+            meeting_timestamp = meeting.get('timestamp')
+            if isinstance(meeting_timestamp, datetime):
+                meeting_timestamp = meeting_timestamp.timestamp()  # Convert to Unix timestamp
 
-        if meetings_list:
-            # Check for the latest meeting summary within the meetings_list
-            for meeting in meetings_list:
-                # Convert timestamp to a comparable format
-                meeting_timestamp = meeting.get('timestamp')
+            if meeting_timestamp and meeting_timestamp > latest_timestamp:
+                latest_timestamp = meeting_timestamp
+                latest_doc = doc
+                latest_bot_id = bot_doc.id
 
-                if isinstance(meeting_timestamp, datetime):
-                    meeting_timestamp = meeting_timestamp.timestamp()  # Convert to Unix timestamp
+    return latest_doc, latest_bot_id
+
+
+@app.route('/last_meeting_summary', methods=['POST'])
+@require_auth
+def get_last_meeting_summary():
+    data = request.get_json()  # Retrieve the JSON body
+    user_id = g.uid or data.get('user_id')  # Extract user_id from the JSON body
+
+    if not user_id:
+        logger.error("user_id parameter is required")
+        return jsonify({'error': 'user_id parameter is required'}), 400
 
-                if meeting_timestamp > latest_timestamp:
-                    latest_timestamp = meeting_timestamp
-                    latest_meeting_summary = meeting
+    # Read the copy kept up to date by save_meeting_summary, then its transcript chunks
+    with firestore_seconds.time(op='load_latest_summary'):
+        latest_meeting_summary = meeting_store.load_latest(user_id)
+    if latest_meeting_summary is None:
+        with firestore_seconds.time(op='find_latest_summary'):
+            latest_meeting_summary = find_latest_meeting_summary(user_id)
 
     if latest_meeting_summary:
         logger.info("Latest meeting summary found")
@@ -689,9 +1331,10 @@ def get_last_meeting_summary():
     
 
 @app.route('/uploads', methods=['GET'])
+@require_auth
 def get_user_uploads():
     try:
-        user_id = request.args.get('user_id')  # Get the user_id from the request
+        user_id = g.uid or request.args.get('user_id')  # Get the user_id from the request
 
         # Validate that user_id is provided
         if not user_id:
@@ -701,16 +1344,29 @@ def get_user_uploads():
         user_ref = db.collection('users').document(user_id)
 
         # Check if the user document exists
-        user_doc = user_ref.get()
+        with firestore_seconds.time(op='get_user'):
+            user_doc = user_ref.get()
         if not user_doc.exists:
             return jsonify({'error': 'User does not exist!'}), 404
 
         # Reference to the 'uploads' collection under the user's document
         uploads_ref = user_ref.collection('uploads')
+
+        # Paginated, projected listing when the client asks for it; full
+        # transcripts come from /uploads/<upload_id>
+        if wants_page():
+            try:
+                page = list_page(uploads_ref, list(UPLOAD_LIST_FIELDS))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            logger.info("Uploads page retrieved successfully")
+            return jsonify(page), 200
+
         uploads = []
 
         # Fetch all uploads for the user
-        docs = uploads_ref.stream()
+        with firestore_seconds.time(op='list_all'):
+            docs = list(uploads_ref.stream())
 
         for doc in docs:
             upload_data = doc.to_dict()
@@ -724,10 +1380,32 @@ def get_user_uploads():
         logger.error(f"An error occurred: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/uploads/<upload_id>', methods=['GET'])
+@require_auth
+def get_user_upload(upload_id):
+    try:
+        user_id = g.uid or request.args.get('user_id')
+        if not user_id:
+            return jsonify({'error': 'user_id is required'}), 400
+
+        with firestore_seconds.time(op='get_upload'):
+            upload_doc = db.collection('users').document(user_id).collection('uploads').document(upload_id).get()
+        if not upload_doc.exists:
+            return jsonify({'error': 'Upload does not exist!'}), 404
+
+        upload_data = upload_doc.to_dict()
+        upload_data['id'] = upload_doc.id
+        return jsonify(upload_data), 200
+
+    except Exception as e:
+        logger.error(f"An error occurred: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/delete_upload', methods=['DELETE'])
+@require_auth
 def delete_upload():
     try:
-        user_id = request.args.get('user_id')
+        user_id = g.uid or request.args.get('user_id')
         meeting_id = request.args.get('meeting_id')
 
         # Validate that both user_id and meeting_id are provided
@@ -741,11 +1419,14 @@ def delete_upload():
         uploads_ref = user_ref.collection('uploads').document(meeting_id)
 
         # Check if the meeting document exists
-        if not uploads_ref.get().exists:
+        with firestore_seconds.time(op='get_upload'):
+            upload_doc = uploads_ref.get()
+        if not upload_doc.exists:
             return jsonify({'error': 'Meeting does not exist!'}), 404
 
         # Delete the meeting
-        uploads_ref.delete()
+        with firestore_seconds.time(op='delete_upload'):
+            uploads_ref.delete()
 
         logger.info(f"Meeting with ID {meeting_id} deleted successfully for user {user_id}")
         return jsonify({'message': 'Meeting deleted successfully!'}), 200
@@ -754,239 +1435,276 @@ def delete_upload():
         logger.error(f"An error occurred: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.errorhandler(404)
-def not_found(error):
-    # Initialize variables to hold the extracted values
-    bot_id = None
-    event = None
-    status_code = None
-    created_at = None
+# MeetingBaaS webhooks are acknowledged right away; the slow 'complete'
+# processing (recording transfer, summary, Firestore writes) runs on its own
+# worker pool. webhook_events/{bot_id}:{event} records each queued event so a
+# redelivered webhook is not processed twice.
+WEBHOOK_EVENTS_COLLECTION = 'webhook_events'
+MEETINGBAAS_WEBHOOK_HEADER = 'x-meeting-baas-api-key'
+MEETINGBAAS_WEBHOOK_REQUIRE_KEY = os.getenv("MEETINGBAAS_WEBHOOK_REQUIRE_KEY", "false").lower() in ("1", "true", "yes")
 
-    # Attempt to capture JSON payload from the request
-    request_data = request.get_json()
+# An unfinished event with no progress for this long is assumed lost (process
+# killed or frozen after the 202) and a redelivery may take it over
+WEBHOOK_EVENT_RECLAIM_S = float(os.getenv("WEBHOOK_EVENT_RECLAIM_S", 30 * 60))
 
-    # Define helper functions inside the error handler
-    def download_mp4(mp4_url, local_file_path):
-        try:
-            response = requests.get(mp4_url)
-            response.raise_for_status()
-            with open(local_file_path, 'wb') as file:
-                file.write(response.content)
-            app.logger.info(f"Downloaded MP4 for bot {bot_id}: {local_file_path}")
-        except Exception as e:
-            app.logger.error(f"Error downloading MP4: {e}")
-
-    def upload_mp4_to_s3(local_file_path, bot_id):
-        try:
-        # Upload the file to S3
-            s3.upload_file(local_file_path, AWS_BUCKET_NAME, f"{bot_id}.mp4")
-        
-        # Set the object to be public
-            s3.put_object_acl(ACL='public-read', Bucket=AWS_BUCKET_NAME, Key=f"{bot_id}.mp4")
-        
-        # Generate the public S3 URL
-            s3_url = f"https://{AWS_BUCKET_NAME}.s3.amazonaws.com/{bot_id}.mp4"
-        
-            app.logger.info(f"Uploaded MP4 to S3 for bot {bot_id}: {s3_url}")
-            return s3_url
-        except (NoCredentialsError, PartialCredentialsError) as e:
-            app.logger.error(f"Credentials error: {e}")
-        except Exception as e:
-            app.logger.error(f"Error uploading MP4 to S3: {e}")
-        return None
+webhook_runner = JobRunner(db, max_workers=int(os.getenv("WEBHOOK_WORKERS", 4)),
+                           collection=WEBHOOK_EVENTS_COLLECTION, timed=time_firestore)
 
-    # Check if request_data is not None and contains the expected keys
-    if request_data and 'event' in request_data:
-        event = request_data['event']
-        bot_id = request_data['data'].get('bot_id')
-
-        if event == 'bot.status_change':
-            status_code = request_data['data'].get('status', {}).get('code')
-            created_at = request_data['data'].get('status', {}).get('created_at')
-
-            # If bot_id is tracked, update its status and trigger the event
-            if bot_id in bot_status_event:
-                bot_status_data[bot_id] = {
-                    "status": status_code,
-                    "created_at": created_at
-                }
-                app.logger.info(f"Received status update for bot {bot_id}: {status_code}")
-
-                # Mark the event as complete if the status is 'call_ended' or 'failed'
-                if status_code in ['call_ended', 'failed']:
-                    bot_status_event[bot_id].set()
-
-        elif event == 'failed':
-            # Handle failed event
-            error_message = request_data['data'].get('error')
-            app.logger.info(f"Bot {bot_id} failed: {error_message}")
-            if bot_id in bot_status_event:
-                bot_status_data[bot_id] = {
-                    "status": "failed",
-                    "created_at": created_at
-                }
-                bot_status_event[bot_id].set()
-
-        elif event == 'complete':
-            # Handle complete event directly from request_data
-            meeting_data = request_data['data']  # Use the data from the request
-
-            app.logger.info(f"Meeting data for bot {bot_id}: {meeting_data}")
-            # Query Firestore to find the user associated with the bot_id
-            users_ref = db.collection('users')
-
-            # Extract user IDs from matching documents
-            user_uid = None
-            while user_uid is None:
-                user_docs = users_ref.stream()
-
-                # Extract user IDs from matching documents
-                for user_doc in user_docs:
-                    bots_ref = user_doc.reference.collection('bots')  # Reference to the bots subcollection
-                    bot_doc = bots_ref.document(bot_id).get()  # Check if the bot exists
-
-                    if bot_doc.exists:
-                        user_uid = user_doc.id  # Store the found user ID
-                        app.logger.info(f"User ID associated with bot {bot_id}: {user_uid}")
-                        # Break out of the loop once a user ID is found
-
-            # If user_uid is still None, log an error and wait before retrying
-            if user_uid is None:
-                app.logger.error(f"No user found for bot ID: {bot_id}. Retrying...")
-                time.sleep(5)
-
-            # At this point, user_uid has been found, proceed with fetching the bot document
-            bot_doc_ref = db.collection('users').document(user_uid).collection('bots').document(bot_id)
-            bot_doc = bot_doc_ref.get()
 
-            if not bot_doc.exists:
-                app.logger.error("No such bot document!")
-                return 
+def upload_mp4_to_s3(mp4_url, bot_id):
+    try:
+        # Stream the recording into S3 (or copy it server-side) and get the public S3 URL
+        with stage_seconds.time(stage='recording_transfer'):
+            s3_url = media_transfer.copy_from_url(mp4_url, f"{bot_id}.mp4")
+        app.logger.info(f"Uploaded MP4 to S3 for bot {bot_id}: {s3_url}")
+        return s3_url
+    except (botocore_exceptions.NoCredentialsError, botocore_exceptions.PartialCredentialsError) as e:
+        app.logger.error(f"Credentials error: {e}")
+    except Exception as e:
+        app.logger.error(f"Error transferring MP4 to S3: {e}")
+    return None
 
-            # Extract necessary data
-            mp4_url = meeting_data['mp4']  # Correct way to get the mp4 URL
-            attendees = meeting_data['speakers']  # Correct way to get the attendees/speakers
 
-            # Download MP4 file locally
-            local_file_path = f'/{bot_id}.mp4'  # Temporary local path
-            download_mp4(mp4_url, local_file_path)
+def run_meeting_complete_job(job, progress):
+    bot_id = job.payload['bot_id']
+    meeting_data = job.payload['meeting_data']
 
-            # Upload to S3 and get the uploaded URL
-            uploaded_mp4_url = upload_mp4_to_s3(local_file_path,bot_id)
+    def lookup(results):
+        # Resolve the user that owns this bot through the bot index
+        with firestore_seconds.time(op='resolve_bot'):
+            user_uid = bot_index.resolve(bot_id)
+        if user_uid is None:
+            raise RuntimeError(f"No user found for bot ID: {bot_id}")
+        app.logger.info(f"User ID associated with bot {bot_id}: {user_uid}")
 
-            if uploaded_mp4_url is None:
-                app.logger.error("Failed to upload MP4 to S3.")
-                return 
+        bot_doc_ref = db.collection('users').document(user_uid).collection('bots').document(bot_id)
+        with firestore_seconds.time(op='get_bot'):
+            bot_doc = bot_doc_ref.get()
+        if not bot_doc.exists:
+            raise RuntimeError(f"No such bot document for bot ID: {bot_id}")
+        return user_uid, bot_doc_ref
+
+    def transfer(results):
+        # Transfer the recording to S3 and get the uploaded URL
+        uploaded_mp4_url = upload_mp4_to_s3(meeting_data['mp4'], bot_id)
+        if uploaded_mp4_url is None:
+            raise RuntimeError("Failed to upload MP4 to S3.")
+        return uploaded_mp4_url
+
+    def transcript(results):
+        return list(iter_statements(webhook_utterances(meeting_data), TRANSCRIPT_TURN_GAP_S))
+
+    def summarize(results):
+        return summarize_transcript(results['transcript'])
+
+    def save(results):
+        user_uid, bot_doc_ref = results['lookup']
+        meeting_summary_firebase = {
+            'attendees': meeting_data['speakers'],
+            'transcription': results['transcript'],
+            'summary': results['summarize'],
+            'mp4_url': results['transfer'],  # Store the S3 URL
+            'timestamp': firestore.SERVER_TIMESTAMP,
+        }
+        # Save to Firestore, marking the bot complete in the same batch
+        return save_meeting_summary(user_uid, bot_id, bot_doc_ref, meeting_summary_firebase, status="complete")
+
+    # The summary only needs the webhook's transcript, so it runs while the
+    # recording is transferred; both join before the Firestore write
+    graph = (StageGraph('meeting-complete')
+             .add('lookup', lookup)
+             .add('transfer', transfer, after=['lookup'])
+             .add('transcript', transcript)
+             .add('summarize', summarize, after=['transcript'])
+             .add('save', save, after=['lookup', 'transfer', 'summarize']))
+    results, timings = graph.run(on_start=progress)
+    critical_path = graph.critical_path(timings)
+    for stage in graph.stages:
+        meeting_stage_seconds.observe(timings[stage]['duration_ms'] / 1000, stage=stage)
+    app.logger.info(f"Meeting {bot_id} completed in {timings['total_ms']}ms, "
+                    f"critical path {' -> '.join(critical_path)}, stages {timings}")
+
+    # Update bot status for the complete event
+    bot_status_store.publish(bot_id, "complete", meeting_data.get('created_at'))
+    bot_completions.complete(bot_id)
+    return {
+        'user_id': results['lookup'][0],
+        'summary_id': results['save'].id,
+        'stage_timings': timings,
+        'critical_path': critical_path,
+    }
 
-            # Extract transcription and summary logic
-            speaker_statements = extract_speaker_statements(meeting_data)
-            merged_statements = merge_statements(speaker_statements)
-            summary = summarize_transcript(merged_statements, model)
 
-            # Prepare the meeting_summary object for Firestore
-            meeting_summary_firebase = {
-                'attendees': attendees,
-                'transcription': merged_statements,
-                'summary': summary,
-                'mp4_url': uploaded_mp4_url,  # Store the S3 URL
-                'timestamp': firestore.SERVER_TIMESTAMP,
-            }
+webhook_runner.register('meeting_complete', run_meeting_complete_job)
 
-            # Save to Firestore
-            bot_doc_ref.collection('meeting_summary').add(meeting_summary_firebase)
 
-            # Update bot status for the complete event
-            if bot_id in bot_status_event:
-                bot_status_data[bot_id] = {
-                    "status": "complete",
-                    "created_at": meeting_data.get('created_at')
-                }
-                bot_status_event[bot_id].set()
+def webhook_event_reclaimable(event):
+    # Failed events, and unfinished ones that stopped making progress, may be processed again
+    status = event.get('status')
+    if status == JOB_FAILED:
+        return True
+    if status in FINAL_STATES:
+        return False
+    last_progress = event.get('updated_at') or event.get('created_at')
+    if not isinstance(last_progress, datetime):
+        return False
+    age = (datetime.now(timezone.utc) - last_progress).total_seconds()
+    return age > WEBHOOK_EVENT_RECLAIM_S
 
-    # Log the extracted values
-    app.logger.info(f'404 Error: {error}, Event: {event}, Bot ID: {bot_id}, Status: {status_code}, Created At: {created_at}')
 
-    return jsonify({
-        "event": event,
-        "bot_id": bot_id,
-        "status": status_code,
-        "created_at": created_at
-    }), 404
+def _reclaim_webhook_event(transaction, event_ref):
+    # Run through firestore.transactional, so only one redelivery takes the event over
+    snapshot = event_ref.get(transaction=transaction)
+    if snapshot.exists and not webhook_event_reclaimable(snapshot.to_dict() or {}):
+        return False
+    transaction.set(event_ref, {'status': 'received', 'updated_at': firestore.SERVER_TIMESTAMP}, merge=True)
+    return True
 
 
-# Extract speaker statements from meeting data
-def extract_speaker_statements(meeting_data):
-    # Assuming the correct key is 'transcript' based on your API response, not 'editors'
-    transcripts = meeting_data.get('transcript', [])
-    speaker_transcripts = defaultdict(lambda: defaultdict(list))
+def claim_webhook_event(event_key):
+    # Returns True if this delivery should be processed: the event is new, or
+    # its earlier processing failed or was lost and the provider is retrying it
+    from google.api_core.exceptions import AlreadyExists
 
-    for transcript in transcripts:
-        speaker = transcript.get('speaker')
-        words = transcript.get('words', [])
+    event_ref = db.collection(WEBHOOK_EVENTS_COLLECTION).document(event_key)
+    with firestore_seconds.time(op='create_webhook_event') as timer:
+        try:
+            event_ref.create({'status': 'received', 'created_at': firestore.SERVER_TIMESTAMP,
+                              'updated_at': firestore.SERVER_TIMESTAMP})
+            return True
+        except AlreadyExists:
+            # A redelivery, not a failed write
+            timer['outcome'] = 'exists'
+
+    with firestore_seconds.time(op='get_webhook_event'):
+        existing = event_ref.get()
+    if existing.exists and not webhook_event_reclaimable(existing.to_dict() or {}):
+        return False
+    with firestore_seconds.time(op='reclaim_webhook_event'):
+        reclaimed = firestore.transactional(_reclaim_webhook_event)(db.transaction(), event_ref)
+    if reclaimed:
+        logger.warning(f"Reprocessing webhook event {event_key}")
+        return True
+    return False
+
+
+MEETINGBAAS_WEBHOOK_EVENTS = ('bot.status_change', 'failed', 'complete')
+
+
+def accept_meetingbaas_webhook(request_data):
+    body, status_code = handle_meetingbaas_webhook(request_data)
+    event = request_data.get('event')
+    webhook_events.inc(event=event if event in MEETINGBAAS_WEBHOOK_EVENTS else 'other', code=status_code)
+    return body, status_code
+
+
+def handle_meetingbaas_webhook(request_data):
+    # Handles cheap events inline and queues 'complete'. Returns (body, status code).
+    event = request_data.get('event')
+    data = request_data.get('data') or {}
+    bot_id = data.get('bot_id')
+    if not event or not bot_id:
+        return {"error": "event and data.bot_id are required"}, 400
+
+    if event == 'bot.status_change':
+        status_code = (data.get('status') or {}).get('code')
+        created_at = (data.get('status') or {}).get('created_at')
+
+        # If bot_id is tracked, update its status and notify the streams
+        if bot_status_store.publish(bot_id, status_code, created_at):
+            app.logger.info(f"Received status update for bot {bot_id}: {status_code}")
+        return {"event": event, "bot_id": bot_id, "status": status_code, "created_at": created_at}, 200
+
+    if event == 'failed':
+        # Handle failed event
+        app.logger.info(f"Bot {bot_id} failed: {data.get('error')}")
+        bot_status_store.publish(bot_id, "failed", None)
+        bot_completions.complete(bot_id, "failed")
+        return {"event": event, "bot_id": bot_id, "status": "failed"}, 200
+
+    if event == 'complete':
+        event_key = f"{bot_id}:{event}"
+        if not claim_webhook_event(event_key):
+            app.logger.info(f"Ignoring duplicate {event} webhook for bot {bot_id}")
+            return {"event": event, "bot_id": bot_id, "duplicate": True}, 200
+        try:
+            webhook_runner.submit('meeting_complete', None, {'bot_id': bot_id, 'meeting_data': data},
+                                  job_id=event_key)
+        except QueueFull:
+            # The event record is marked failed, so the provider's retry is accepted
+            return {"error": "Too many webhook events in progress, try again later"}, 503
+        return {"event": event, "bot_id": bot_id, "queued": True}, 202
 
-        if not speaker or not words:
-            continue  # Skip if no speaker or words
+    return {"event": event, "bot_id": bot_id, "ignored": True}, 200
 
-        start_time = words[0].get('start', 0.0)  # Adjust to match your API response (start, end, word)
-        text = ' '.join(word.get('word') for word in words if word.get('word')).strip()  # Use 'word' not 'text'
 
-        if text:
-            speaker_transcripts[speaker][start_time].append(text)
+@app.route('/meetingbaas-webhook', methods=['POST'])
+def meetingbaas_webhook():
+    api_key = API_HEADERS["x-spoke-api-key"]
+    received_key = request.headers.get(MEETINGBAAS_WEBHOOK_HEADER)
+    if api_key and (received_key or MEETINGBAAS_WEBHOOK_REQUIRE_KEY) and received_key != api_key:
+        return jsonify({"error": "Invalid webhook key"}), 401
 
-    speaker_statements = []
+    request_data = request.get_json(silent=True)
+    if not isinstance(request_data, dict):
+        return jsonify({"error": "JSON body required"}), 400
 
-    # Organizing speaker statements by time
-    for speaker, timestamps in speaker_transcripts.items():
-        for start_time, texts in sorted(timestamps.items()):
-            full_statement = ' '.join(texts).strip()
-            speaker_statements.append(f"from {start_time:.2f}s {speaker} : {full_statement}")
+    body, status_code = accept_meetingbaas_webhook(request_data)
+    return jsonify(body), status_code
 
-    return speaker_statements
 
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
-# Merge statements of each speaker with similar timestamps
-def merge_statements(statements):
-    merged_statements = []
-    speaker_lines = defaultdict(list)
 
-    for statement in statements:
-        parts = statement.split(' : ', 1)
-        if len(parts) < 2:
-            continue  # Skip malformed statements
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
 
-        timestamp_and_speaker = parts[0].split(' ', 2)
-        if len(timestamp_and_speaker) < 3:
-            continue  # Skip malformed timestamp and speaker part
 
-        timestamp = timestamp_and_speaker[1]  # Extract timestamp
-        speaker = timestamp_and_speaker[2]    # Extract speaker name
-        text = parts[1].strip()               # The actual text spoken
+@app.after_request
+def observe_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.observe(time.perf_counter() - started, endpoint=endpoint,
+                                method=request.method, status=response.status_code)
+    return response
 
-        speaker_lines[(timestamp, speaker)].append(text)
 
-    for (timestamp, speaker), texts in sorted(speaker_lines.items()):
-        full_statement = ' '.join(texts).strip()
-        merged_statements.append(f"{speaker} at {timestamp}s :- {full_statement}")
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Scraped by Prometheus; protected by a bearer token when METRICS_TOKEN is set
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"error": "Unauthorized"}), 401
 
-    return merged_statements
+    for runner_name, runner in (('transcribe', job_runner), ('webhook', webhook_runner)):
+        jobs_in_flight.set(runner.in_flight, runner=runner_name)
+        jobs_queued.set(runner.queue_depth(), runner=runner_name)
+    completions_pending.set(bot_completions.pending_count())
+    log_records_dropped.set(log_handler.dropped)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
-# Summarize the transcript using LLM
-def summarize_transcript(statements, model):
-    try:
-        transcript = "\n".join(statements)
-        prompt = f"Summarize the following meeting transcript:\n{transcript}"
+@app.errorhandler(413)
+def too_large(error):
+    # Bodies over MAX_CONTENT_LENGTH, refused by Werkzeug while reading them
+    return jsonify({"error": "Request body is too large"}), 413
 
-        # Assuming `model` is a function or object for generating content (like GPT-3)
-        response = model.generate_content(prompt)  # Assuming this returns an object with `text` attribute
-        summary = response.text.strip() if hasattr(response, 'text') else "No summary generated."
 
-        return summary
+@app.errorhandler(404)
+def not_found(error):
+    # Webhooks configured with an arbitrary URL still land here; they are
+    # handed to the webhook route's logic and answered with the old 404 shape
+    request_data = request.get_json(silent=True)
+    if isinstance(request_data, dict) and 'event' in request_data:
+        body, status_code = accept_meetingbaas_webhook(request_data)
+        app.logger.info(f'404 Error: {error}, Event: {body.get("event")}, Bot ID: {body.get("bot_id")}')
+        if status_code >= 500:
+            return jsonify(body), status_code
+        return jsonify(body), 404
+
+    return jsonify({"error": "Not found"}), 404
 
-    except AttributeError as e:
-        return f"Error: {str(e)}"
-    except Exception as e:
-        return f"An unexpected error occurred: {str(e)}"
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))  # Default to port 5000 for local testing
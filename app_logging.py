@@ -0,0 +1,131 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# Id of the request (or the job it started) being handled on this thread
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s'
+
+
+def current_request_id():
+    return request_id_var.get()
+
+
+def preview(value, max_chars=500):
+    # Short stand-in for a large payload: strings are cut, lists and dicts
+    # reduced to their size and first items
+    if isinstance(value, (list, tuple)):
+        head = [preview(item, max_chars // 4) for item in value[:3]]
+        return f"<{len(value)} items> {head}"
+    if isinstance(value, dict):
+        return f"<dict keys={sorted(value)[:20]}>"
+    text = str(value)
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [{len(text) - max_chars} more chars]"
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class TruncatingFilter(logging.Filter):
+    # Caps the formatted message so one record cannot carry a whole transcript
+    def __init__(self, max_chars):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def filter(self, record):
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            record.msg = f"{message[:self.max_chars]}... [{len(message) - self.max_chars} chars truncated]"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    # Never blocks the caller: when the writer falls behind, records are dropped and counted
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock_dropped = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_dropped:
+                self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            # Tracebacks were already folded into the message by the queue handler
+            'message': record.getMessage(),
+        }
+        return json.dumps(entry, default=str)
+
+
+class PayloadLogger:
+    # Logs previews of large payloads (prompts, summaries, API responses) at
+    # DEBUG for a sampled share of calls instead of writing them in full
+    def __init__(self, sample_rate=0.01, max_chars=500):
+        self.sample_rate = sample_rate
+        self.max_chars = max_chars
+
+    def __call__(self, logger, label, value):
+        if not logger.isEnabledFor(logging.DEBUG) or random.random() >= self.sample_rate:
+            return
+        logger.debug(f"{label}: {preview(value, self.max_chars)}")
+
+
+def configure_logging(level='INFO', fmt='text', max_chars=2000, queue_size=10000, stream=None):
+    # Records are formatted and written by one listener thread; request
+    # threads only filter and enqueue them. Returns the queue handler.
+    formatter = JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(formatter)
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(TruncatingFilter(max_chars))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    writer = {}
+
+    def start_listener():
+        writer['listener'] = QueueListener(handler.queue, output, respect_handler_level=True)
+        writer['listener'].start()
+
+    def restart_in_child():
+        # The listener thread does not survive a fork (pre-fork servers import
+        # the app once, then fork workers). The parent's queue may have been
+        # locked by that thread mid-get, so the child starts over with a new one.
+        handler.queue = queue.Queue(maxsize=queue_size)
+        start_listener()
+
+    start_listener()
+    os.register_at_fork(after_in_child=restart_in_child)
+    # Flush what is still queued when the process exits
+    atexit.register(lambda: writer['listener'].stop())
+    return handler
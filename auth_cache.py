@@ -0,0 +1,89 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from clients import lazy_module
+
+logger = logging.getLogger(__name__)
+
+auth = lazy_module('firebase_admin.auth')
+
+ID_TOKEN_CERT_URI = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+class TokenVerifier:
+    # Caches decoded Firebase ID tokens until they expire so repeat requests
+    # with the same token skip signature verification entirely.
+    def __init__(self, verify=None, max_entries=10000):
+        self.verify = verify
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def verify_id_token(self, id_token):
+        # Raises whatever auth.verify_id_token raises for invalid tokens
+        key = hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                decoded_token, expires_at = entry
+                if now < expires_at:
+                    self._cache.move_to_end(key)
+                    return decoded_token
+                del self._cache[key]
+
+        decoded_token = (self.verify or auth.verify_id_token)(id_token)
+        expires_at = decoded_token.get('exp', now)
+        with self._lock:
+            self._cache[key] = (decoded_token, expires_at)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return decoded_token
+
+
+class SigningKeyRefresher:
+    # Keeps Google's token signing certificates fresh in the Firebase Admin
+    # SDK's HTTP cache from a background thread, shortly before they expire,
+    # so verify_id_token never has to download them on a request thread.
+    def __init__(self, get_app=None, margin=300, min_interval=60, default_interval=3600):
+        self.get_app = get_app or (lambda: None)
+        self.margin = margin
+        self.min_interval = min_interval
+        self.default_interval = default_interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _session(self):
+        # The SDK fetches certificates through a cachecontrol session on its token verifier
+        client = auth._get_client(self.get_app())
+        return client._token_verifier.request.session
+
+    def refresh(self):
+        # Returns the number of seconds the new certificates stay valid
+        response = self._session().get(ID_TOKEN_CERT_URI, headers={'Cache-Control': 'no-cache'}, timeout=10)
+        response.raise_for_status()
+        match = _MAX_AGE.search(response.headers.get('Cache-Control', ''))
+        return int(match.group(1)) if match else self.default_interval
+
+    def _run(self):
+        while True:
+            try:
+                max_age = self.refresh()
+                delay = max(max_age - self.margin, self.min_interval)
+            except Exception as e:
+                logger.error(f"Refreshing token signing keys failed: {str(e)}")
+                delay = self.min_interval
+            time.sleep(delay)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="signing-key-refresher")
+                self._thread.start()
@@ -0,0 +1,425 @@
+# Offline load test: replaces Firestore, S3, AssemblyAI, Gemini and the
+# MeetingBaaS API with the in-process fakes from benchmarks/fakes.py, drives
+# the routes through Flask's test client at a fixed concurrency and reports
+# throughput, p50/p99 latency, peak thread count and peak RSS per scenario.
+#
+#   python benchmarks/bench_load.py
+#   python benchmarks/bench_load.py --scenario meetings --scenario sse --concurrency 32 --requests 500
+#   python benchmarks/bench_load.py --latency firestore=8 --latency gemini=400 --fail s3=0.02
+import argparse
+import contextlib
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import (Faults, FakeAssemblyAI, FakeFirestore, FakeGenerativeModel, FakeMediaHttp,  # noqa: E402
+                   FakeMeetingBaas, FakeS3, webhook_transcript)
+
+SERVICES = ('firestore', 's3', 'assemblyai', 'gemini', 'meetingbaas', 'recording')
+USER_ID = 'bench-user'
+SEED_BOTS = 200
+SEED_UPLOADS = 200
+
+
+def parse_service_values(values, option):
+    parsed = {}
+    for value in values or []:
+        service, _, number = value.partition('=')
+        if service not in SERVICES or not number:
+            raise SystemExit(f"{option} expects SERVICE=NUMBER with SERVICE one of {', '.join(SERVICES)}")
+        parsed[service] = float(number)
+    return parsed
+
+
+def install_fakes(args):
+    latency = parse_service_values(args.latency, '--latency')
+    jitter = parse_service_values(args.jitter, '--jitter')
+    failures = parse_service_values(args.fail, '--fail')
+    faults = {service: Faults(latency.get(service, 0.0), jitter.get(service, 0.0),
+                              failures.get(service, 0.0), seed=args.seed)
+              for service in SERVICES}
+
+    import app
+
+    fakes = {
+        'firestore': FakeFirestore(faults['firestore']),
+        's3': FakeS3(faults['s3']),
+        'assemblyai': FakeAssemblyAI(faults['assemblyai'], processing_s=args.transcription_s),
+        'genai_model': FakeGenerativeModel(faults['gemini']),
+        'meetingbaas': FakeMeetingBaas(faults['meetingbaas']),
+        'media_http': FakeMediaHttp(faults['recording'], size=args.recording_kb * 1024),
+    }
+    for name, fake in fakes.items():
+        app.clients.register(name, lambda fake=fake: fake)
+
+    # No AssemblyAI webhook offline: poll the fake quickly instead
+    app.transcription_tracker.webhook_url = None
+    app.transcription_tracker.initial_poll = 0.05
+    app.transcription_tracker.max_poll = 0.25
+    return app, fakes, faults
+
+
+def seed(app, fakes):
+    from google.cloud.firestore import SERVER_TIMESTAMP
+
+    user_ref = fakes['firestore'].collection('users').document(USER_ID)
+    user_ref.set({'email': 'bench@example.com'})
+    for i in range(SEED_BOTS):
+        bot_id = f"seed-bot-{i}"
+        bot_ref = user_ref.collection('bots').document(bot_id)
+        bot_ref.set({'bot_id': bot_id, 'meetingUrl': f"https://meet.example.com/{i}",
+                     'status': 'complete', 'timestamp': SERVER_TIMESTAMP})
+        app.save_meeting_summary(USER_ID, bot_id, bot_ref, {
+            'attendees': [{'name': 'Speaker A'}],
+            'transcription': [f"Speaker A at {n}.00s :- line {n}" for n in range(300)],
+            'summary': f"Summary {i}",
+            'mp4_url': f"https://bucket.s3.amazonaws.com/{bot_id}.mp4",
+            'timestamp': SERVER_TIMESTAMP,
+        })
+    for i in range(SEED_UPLOADS):
+        user_ref.collection('uploads').add({
+            'file_name': f"upload-{i}.mp3", 's3_path': f"s3://bucket/upload-{i}.mp3",
+            'transcription': [f"Speaker A: line {n}" for n in range(100)],
+            'summary': f"Upload summary {i}", 'timestamp': SERVER_TIMESTAMP,
+        })
+
+
+class Sampler:
+    # Samples thread count and resident memory while a scenario runs
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def rss_bytes():
+        try:
+            with open('/proc/self/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        # Lifetime peak where /proc is unavailable (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def sample(self):
+        self.peak_threads = max(self.peak_threads, threading.active_count())
+        self.peak_rss = max(self.peak_rss, self.rss_bytes())
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="bench-sampler")
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+# Each scenario is (prepare(app, fakes, count) -> state, request(client, index, state) -> status code)
+
+def prepare_nothing(app, fakes, count):
+    return None
+
+
+def request_meetings(client, index, state):
+    return client.post(f"/meetings?user_id={USER_ID}&limit=20").status_code
+
+
+def request_uploads(client, index, state):
+    return client.get(f"/uploads?user_id={USER_ID}&limit=20").status_code
+
+
+def request_last_summary(client, index, state):
+    return client.post('/last_meeting_summary', json={'user_id': USER_ID}).status_code
+
+
+def request_transcribe(client, index, state):
+    # Distinct bytes per request so the transcription cache never hits
+    body = index.to_bytes(8, 'big') + b'\0' * state
+    response = client.post(f"/transcribe?user_id={USER_ID}&file_name=bench-{index}.mp3",
+                           data=body, content_type='audio/mpeg')
+    return response.status_code
+
+
+def prepare_transcribe(app, fakes, count):
+    return ARGS.upload_kb * 1024
+
+
+def prepare_transcribe_async(app, fakes, count):
+    return {'size': ARGS.upload_kb * 1024, 'job_ids': []}
+
+
+def request_transcribe_async(client, index, state):
+    # Returns once the upload is queued; the job is parked on AssemblyAI and
+    # resumed by the tracker's poller in a transaction. The bytes differ from
+    # the sync scenario's so the transcription cache never hits.
+    body = (index + 1 << 32).to_bytes(8, 'big') + b'\0' * state['size']
+    response = client.post(f"/transcribe?user_id={USER_ID}&file_name=bench-async-{index}.mp3&async=1",
+                           data=body, content_type='audio/mpeg')
+    if response.status_code == 202:
+        state['job_ids'].append(response.get_json()['job_id'])
+    return response.status_code
+
+
+def drain_transcribe_async(app, fakes, state):
+    # Waits until every accepted job has finished and returns how many completed
+    from jobs import FINAL_STATES, JOB_COMPLETED
+
+    paths = [('users', USER_ID, 'jobs', job_id) for job_id in state['job_ids']]
+    deadline = time.monotonic() + ARGS.drain_timeout
+    while time.monotonic() < deadline:
+        with fakes['firestore'].lock:
+            statuses = [fakes['firestore'].docs.get(path, {}).get('status') for path in paths]
+        if all(status in FINAL_STATES for status in statuses):
+            break
+        time.sleep(0.05)
+    return statuses.count(JOB_COMPLETED)
+
+
+def post_webhook(client, payload):
+    # Status webhooks go through the 404 handler, as when MeetingBaaS is configured with an arbitrary URL
+    return client.post('/meetingbaas/events', json=payload)
+
+
+def request_sse(client, index, state):
+    response = client.post('/start-meeting-bot', json={'meeting_url': f"https://meet.example.com/sse-{index}",
+                                                       'user_id': USER_ID}, buffered=False)
+    if response.status_code != 200:
+        return response.status_code
+    chunks = iter(response.response)
+    first = next(chunks).decode()
+    bot_id = json.loads(first.split('data: ', 1)[1])['bot_id']
+    for code in ('joining_call', 'in_call_recording', 'call_ended'):
+        post_webhook(client, {'event': 'bot.status_change', 'data': {'bot_id': bot_id, 'status': {'code': code}}})
+    for chunk in chunks:
+        if b'call ended' in chunk:
+            break
+    response.close()
+    return 200
+
+
+def prepare_meeting_data(app, fakes, count):
+    # Bots without a saved summary, each requested by 8 clients at once
+    from google.cloud.firestore import SERVER_TIMESTAMP
+
+    user_ref = fakes['firestore'].collection('users').document(USER_ID)
+    bot_ids = []
+    for i in range(max(1, count // 8)):
+        bot_id = f"miss-bot-{i}-{time.monotonic_ns()}"
+        user_ref.collection('bots').document(bot_id).set({'bot_id': bot_id, 'timestamp': SERVER_TIMESTAMP})
+        bot_ids.append(bot_id)
+    return {'bot_ids': bot_ids}
+
+
+def request_meeting_data(client, index, state):
+    bot_ids = state['bot_ids']
+    bot_id = bot_ids[index * len(bot_ids) // ARGS.requests]
+    return client.get(f"/meeting_data?user_id={USER_ID}&bot_id={bot_id}").status_code
+
+
+def request_meeting_data_batch(client, index, state):
+    # A dashboard page: 50 seeded bots in one request
+    bot_ids = [f"seed-bot-{(index + i) % SEED_BOTS}" for i in range(50)]
+    return client.post('/meeting_data/batch', json={'user_id': USER_ID, 'bot_ids': bot_ids}).status_code
+
+
+def prepare_webhooks(app, fakes, count):
+    # One registered bot per 'complete' event so no delivery is a duplicate
+    from google.cloud.firestore import SERVER_TIMESTAMP
+
+    user_ref = fakes['firestore'].collection('users').document(USER_ID)
+    bot_ids = []
+    for i in range(count):
+        bot_id = f"webhook-bot-{i}-{time.monotonic_ns()}"
+        user_ref.collection('bots').document(bot_id).set({'bot_id': bot_id, 'timestamp': SERVER_TIMESTAMP})
+        app.bot_index.register(bot_id, USER_ID)
+        bot_ids.append(bot_id)
+    return {'bot_ids': bot_ids}
+
+
+def request_webhook(client, index, state):
+    bot_id = state['bot_ids'][index]
+    response = client.post('/meetingbaas-webhook', json={'event': 'complete', 'data': {
+        'bot_id': bot_id, 'mp4': 'https://recordings.example.com/meeting.mp4',
+        'speakers': ['Speaker A', 'Speaker B'], 'transcript': webhook_transcript(topic=bot_id),
+    }})
+    return response.status_code
+
+
+def drain_webhooks(app, fakes, state):
+    # Waits until every queued 'complete' event has finished processing and
+    # returns how many did; with injected Firestore failures some final states
+    # are never recorded
+    from jobs import FINAL_STATES
+
+    keys = [f"{bot_id}:complete" for bot_id in state['bot_ids']]
+    deadline = time.monotonic() + ARGS.drain_timeout
+    done = 0
+    while time.monotonic() < deadline:
+        # Read the fake's storage directly so injected faults do not apply
+        with fakes['firestore'].lock:
+            done = sum(1 for key in keys
+                       if fakes['firestore'].docs.get((app.WEBHOOK_EVENTS_COLLECTION, key), {}).get('status')
+                       in FINAL_STATES)
+        if done == len(keys):
+            break
+        time.sleep(0.05)
+    return done
+
+
+SCENARIOS = {
+    'meetings': (prepare_nothing, request_meetings, None),
+    'uploads': (prepare_nothing, request_uploads, None),
+    'last-summary': (prepare_nothing, request_last_summary, None),
+    'transcribe': (prepare_transcribe, request_transcribe, None),
+    'transcribe-async': (prepare_transcribe_async, request_transcribe_async, drain_transcribe_async),
+    'sse': (prepare_nothing, request_sse, None),
+    'meeting-data': (prepare_meeting_data, request_meeting_data, None),
+    'meeting-data-batch': (prepare_nothing, request_meeting_data_batch, None),
+    'webhook': (prepare_webhooks, request_webhook, drain_webhooks),
+}
+
+ARGS = None
+
+
+@contextlib.contextmanager
+def faults_paused(faults):
+    # Seeding and bookkeeping reads should neither fail nor be slowed down
+    for fault in faults.values():
+        fault.enabled = False
+    try:
+        yield
+    finally:
+        for fault in faults.values():
+            fault.enabled = True
+
+
+def run_scenario(app, fakes, faults, name, count, concurrency):
+    prepare, request, drain = SCENARIOS[name]
+    with faults_paused(faults):
+        state = prepare(app, fakes, count)
+    local = threading.local()
+    latencies = []
+    errors = []
+
+    def one(index):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.app.test_client()
+        started = time.perf_counter()
+        try:
+            status = request(client, index, state)
+        except Exception as e:
+            status = repr(e)
+        latencies.append(time.perf_counter() - started)
+        if not isinstance(status, int) or status >= 400:
+            errors.append(status)
+
+    with Sampler() as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"bench-{name}") as executor:
+            list(executor.map(one, range(count)))
+        elapsed = time.perf_counter() - started
+        drained = drained_s = None
+        if drain is not None:
+            drained = drain(app, fakes, state)
+            drained_s = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'scenario': name,
+        'requests': count,
+        'errors': len(errors),
+        'error_sample': errors[:3],
+        'rps': count / elapsed if elapsed else 0.0,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000,
+        'drained': drained,
+        'drained_s': drained_s,
+        'peak_threads': sampler.peak_threads,
+        'peak_rss_mb': sampler.peak_rss / 1e6,
+    }
+
+
+def main():
+    global ARGS
+    parser = argparse.ArgumentParser(description="Load test app.py routes against in-process fakes")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help="default: all")
+    parser.add_argument('--requests', type=int, default=200, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', action='append', metavar='SERVICE=MS', help="added latency per call")
+    parser.add_argument('--jitter', action='append', metavar='SERVICE=MS', help="+/- latency jitter")
+    parser.add_argument('--fail', action='append', metavar='SERVICE=RATE', help="share of calls that fail")
+    parser.add_argument('--transcription-s', type=float, default=0.2, help="fake AssemblyAI processing time")
+    parser.add_argument('--upload-kb', type=int, default=256, help="/transcribe body size")
+    parser.add_argument('--recording-kb', type=int, default=1024, help="recording size for 'complete' webhooks")
+    parser.add_argument('--drain-timeout', type=float, default=30, help="seconds to wait for queued work")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--verbose', action='store_true', help="keep the app's error logs")
+    parser.add_argument('--json', action='store_true', help="print one JSON object per scenario")
+    parser.add_argument('--metrics', action='store_true', help="print the app's /metrics afterwards")
+    ARGS = args = parser.parse_args()
+
+    out = sys.stdout
+    # The app's log writer holds on to the stdout it sees at import, so
+    # importing it here sends its per-request logs to devnull
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        app, fakes, faults = install_fakes(args)
+        level = logging.ERROR if args.verbose else logging.CRITICAL
+        logging.getLogger().setLevel(level)
+        app.app.logger.setLevel(level)
+        with faults_paused(faults):
+            seed(app, fakes)
+
+        results = []
+        for name in args.scenario or list(SCENARIOS):
+            results.append(run_scenario(app, fakes, faults, name, args.requests, args.concurrency))
+        exposition = app.app.test_client().get('/metrics').get_data(as_text=True) if args.metrics else None
+
+    if exposition:
+        print(exposition, file=out)
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result), file=out)
+        return
+
+    print(f"{args.requests} requests per scenario at concurrency {args.concurrency}", file=out)
+    print(f"{'scenario':<20}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'threads':>9}{'rss MB':>9}"
+          f"{'drained s':>11}", file=out)
+    for result in results:
+        drained = '-'
+        if result['drained'] is not None:
+            drained = f"{result['drained_s']:.2f}"
+            if result['drained'] < result['requests']:
+                drained = f"{result['drained']}/{result['requests']}"
+        print(f"{result['scenario']:<20}{result['rps']:9.1f}{result['p50_ms']:9.1f}{result['p99_ms']:9.1f}"
+              f"{result['errors']:8d}{result['peak_threads']:9d}{result['peak_rss_mb']:9.1f}{drained:>11}",
+              file=out)
+        if result['error_sample']:
+            print(f"{'':<20}first errors: {result['error_sample']}", file=out)
+    calls = ', '.join(f"{service} {fault.calls} calls/{fault.failures} failed" for service, fault in faults.items())
+    print(f"fakes: {calls}", file=out)
+
+
+if __name__ == '__main__':
+    main()
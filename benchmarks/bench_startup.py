@@ -0,0 +1,94 @@
+# Cold-start benchmark: for every probe, starts a fresh interpreter, imports
+# app.py and sends one request, then reports the import time, the first-request
+# latency and which lazy clients that request had to create.
+#
+#   python benchmarks/bench_startup.py              # all probes, 3 runs each
+#   python benchmarks/bench_startup.py --repeat 5 --probe uploads --probe verify-token
+#
+# Probes talk to the services configured in .env. Routes that would start a
+# meeting bot or upload files are left out on purpose.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBES = {
+    'import-only': None,
+    'verify-token': ('POST', '/verify-token', {'json': {'idToken': 'not-a-real-token'}}),
+    'meetings': ('POST', '/meetings?user_id=benchmark-user&limit=20', {}),
+    'uploads': ('GET', '/uploads?user_id=benchmark-user&limit=20', {}),
+    'last-meeting-summary': ('POST', '/last_meeting_summary', {'json': {'user_id': 'benchmark-user'}}),
+    'meeting-data': ('GET', '/meeting_data?user_id=benchmark-user&bot_id=benchmark-bot', {}),
+}
+
+
+def run_probe(name):
+    # Runs inside the child interpreter
+    sys.path.insert(0, ROOT)
+    started = time.perf_counter()
+    import app
+    import_s = time.perf_counter() - started
+
+    result = {'probe': name, 'import_s': import_s, 'first_request_s': None, 'status': None}
+    probe = PROBES[name]
+    if probe is not None:
+        method, path, kwargs = probe
+        client = app.app.test_client()
+        started = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        result['first_request_s'] = time.perf_counter() - started
+        result['status'] = response.status_code
+    result['clients'] = app.clients.initialized()
+    print(json.dumps(result))
+
+
+def measure(name, timeout):
+    try:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name],
+                                   capture_output=True, text=True, timeout=timeout, cwd=ROOT)
+    except subprocess.TimeoutExpired:
+        return {'probe': name, 'error': f'timed out after {timeout}s'}
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return {'probe': name, 'error': (completed.stderr.strip().splitlines() or ['no output'])[-1]}
+
+
+def ms(seconds):
+    return f"{seconds * 1000:8.1f}" if seconds is not None else "       -"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and first-request latency per route")
+    parser.add_argument('--probe', action='append', choices=sorted(PROBES), help="probe to run (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="fresh interpreters per probe")
+    parser.add_argument('--timeout', type=float, default=60, help="seconds before a probe is abandoned")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_probe(args.child)
+        return
+
+    print(f"{'probe':<22}{'import ms':>10}{'request ms':>12}{'status':>8}  clients created (ms)")
+    for name in args.probe or list(PROBES):
+        runs = [measure(name, args.timeout) for _ in range(args.repeat)]
+        ok = [run for run in runs if 'error' not in run]
+        if not ok:
+            print(f"{name:<22}  error: {runs[-1]['error']}")
+            continue
+
+        import_s = statistics.median(run['import_s'] for run in ok)
+        request_times = [run['first_request_s'] for run in ok if run['first_request_s'] is not None]
+        request_s = statistics.median(request_times) if request_times else None
+        clients = ', '.join(f"{client} {seconds * 1000:.0f}" for client, seconds in ok[-1]['clients'].items())
+        print(f"{name:<22}{ms(import_s):>10}{ms(request_s):>12}{str(ok[-1]['status'] or '-'):>8}  {clients or '-'}")
+
+
+if __name__ == '__main__':
+    main()
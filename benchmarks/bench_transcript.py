@@ -0,0 +1,130 @@
+# Transcript normalization benchmark: builds a synthetic multi-hour webhook
+# payload and compares the old string round-trip (extract_speaker_statements +
+# merge_statements, copied below as they were) with transcript.py's
+# chronological per-speaker stream merge.
+#
+#   python benchmarks/bench_transcript.py --hours 4 --speakers 6 [--gap 1.5]
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript import iter_statements, webhook_utterances  # noqa: E402
+
+WORDS = "we should ship the release after the review once the numbers look right for everyone".split()
+
+
+def synthetic_payload(hours, speakers, seed=7):
+    # One segment every 2-8 seconds of 5-40 words, as the 'complete' webhook sends them
+    rng = random.Random(seed)
+    names = [f"Speaker {chr(65 + i)}" for i in range(speakers)]
+    segments = []
+    clock = 0.0
+    end = hours * 3600
+    while clock < end:
+        words = []
+        word_clock = clock
+        for _ in range(rng.randint(5, 40)):
+            words.append({'start': round(word_clock, 3), 'end': round(word_clock + 0.3, 3),
+                          'word': rng.choice(WORDS)})
+            word_clock += 0.35
+        segments.append({'speaker': rng.choice(names), 'words': words})
+        clock += rng.uniform(2, 8)
+    return {'transcript': segments}
+
+
+def legacy_extract_speaker_statements(meeting_data):
+    transcripts = meeting_data.get('transcript', [])
+    speaker_transcripts = defaultdict(lambda: defaultdict(list))
+    for transcript in transcripts:
+        speaker = transcript.get('speaker')
+        words = transcript.get('words', [])
+        if not speaker or not words:
+            continue
+        start_time = words[0].get('start', 0.0)
+        text = ' '.join(word.get('word') for word in words if word.get('word')).strip()
+        if text:
+            speaker_transcripts[speaker][start_time].append(text)
+    speaker_statements = []
+    for speaker, timestamps in speaker_transcripts.items():
+        for start_time, texts in sorted(timestamps.items()):
+            full_statement = ' '.join(texts).strip()
+            speaker_statements.append(f"from {start_time:.2f}s {speaker} : {full_statement}")
+    return speaker_statements
+
+
+def legacy_merge_statements(statements):
+    merged_statements = []
+    speaker_lines = defaultdict(list)
+    for statement in statements:
+        parts = statement.split(' : ', 1)
+        if len(parts) < 2:
+            continue
+        timestamp_and_speaker = parts[0].split(' ', 2)
+        if len(timestamp_and_speaker) < 3:
+            continue
+        timestamp = timestamp_and_speaker[1]
+        speaker = timestamp_and_speaker[2]
+        text = parts[1].strip()
+        speaker_lines[(timestamp, speaker)].append(text)
+    for (timestamp, speaker), texts in sorted(speaker_lines.items()):
+        full_statement = ' '.join(texts).strip()
+        merged_statements.append(f"{speaker} at {timestamp}s :- {full_statement}")
+    return merged_statements
+
+
+def legacy(payload):
+    return legacy_merge_statements(legacy_extract_speaker_statements(payload))
+
+
+def current(payload, max_gap=0.0):
+    return list(iter_statements(webhook_utterances(payload), max_gap))
+
+
+def bench(func, payload, repeat):
+    timings = []
+    # Like timeit, keep the collector from landing inside one implementation's timing
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func(payload)
+            timings.append(time.perf_counter() - started)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    func(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare transcript normalization implementations")
+    parser.add_argument('--hours', type=float, default=4)
+    parser.add_argument('--speakers', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--gap', type=float, default=0.0,
+                        help="turn coalescing gap in seconds (TRANSCRIPT_TURN_GAP_S)")
+    args = parser.parse_args()
+
+    payload = synthetic_payload(args.hours, args.speakers)
+    print(f"{len(payload['transcript'])} segments, {args.hours}h, {args.speakers} speakers")
+
+    legacy_s, legacy_peak, legacy_lines = bench(legacy, payload, args.repeat)
+    current_s, current_peak, current_lines = bench(lambda p: current(p, args.gap), payload, args.repeat)
+
+    print(f"{'legacy':<10}{legacy_s * 1000:10.1f} ms{legacy_peak / 1e6:10.1f} MB peak  {len(legacy_lines)} lines")
+    print(f"{'current':<10}{current_s * 1000:10.1f} ms{current_peak / 1e6:10.1f} MB peak  {len(current_lines)} lines")
+    print(f"speedup   {legacy_s / current_s:10.2f}x")
+
+
+if __name__ == '__main__':
+    main()
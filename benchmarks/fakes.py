@@ -0,0 +1,528 @@
+# In-process stand-ins for the services app.py talks to, so routes can be
+# load tested offline. Each fake takes a Faults object that adds latency and
+# fails a share of calls. Only the API surface app.py uses is implemented.
+import io
+import itertools
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+
+class FakeServiceError(Exception):
+    pass
+
+
+class Faults:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, failure_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        # Turned off while the harness seeds data
+        self.enabled = True
+
+    def __call__(self, operation):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise FakeServiceError(f"injected failure in {operation}")
+
+
+NO_FAULTS = Faults()
+
+
+# --- Firestore ---------------------------------------------------------------
+
+def _resolve_sentinels(data, existing=None):
+    from google.cloud.firestore import DELETE_FIELD, SERVER_TIMESTAMP
+
+    result = dict(existing or {})
+    for key, value in data.items():
+        if value is DELETE_FIELD:
+            result.pop(key, None)
+        elif value is SERVER_TIMESTAMP:
+            result[key] = datetime.now(timezone.utc)
+        else:
+            result[key] = value
+    return result
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self._db = db
+        self._path = path
+        self.id = path[-1]
+        self.path = '/'.join(path)
+
+    def collection(self, name):
+        return FakeCollection(self._db, self._path + (name,))
+
+    def get(self, transaction=None, field_paths=None):
+        self._db.faults('document.get')
+        with self._db.lock:
+            data = self._db.docs.get(self._path)
+            data = dict(data) if data is not None else None
+        if transaction is not None:
+            transaction._read(self._path, data)
+        if data is not None and field_paths is not None:
+            data = {field: data[field] for field in field_paths if field in data}
+        return FakeSnapshot(self, data)
+
+    def set(self, data, merge=False):
+        self._db.faults('document.set')
+        self._db.apply([('set', self, data, merge)])
+
+    def update(self, data):
+        self._db.faults('document.update')
+        self._db.apply([('update', self, data, True)])
+
+    def create(self, data):
+        self._db.faults('document.create')
+        self._db.apply([('create', self, data, False)])
+
+    def delete(self):
+        self._db.faults('document.delete')
+        self._db.apply([('delete', self, None, False)])
+
+
+class FakeQuery:
+    def __init__(self, db, parent=None, group=None):
+        self._db = db
+        self._parent = parent
+        self._group = group
+        self._filters = []
+        self._order = []
+        self._fields = None
+        self._limit = None
+        self._start_after = None
+
+    def _copy(self, **changes):
+        query = FakeQuery(self._db, self._parent, self._group)
+        query._filters = list(self._filters)
+        query._order = list(self._order)
+        query._fields = self._fields
+        query._limit = self._limit
+        query._start_after = self._start_after
+        for name, value in changes.items():
+            setattr(query, f"_{name}", value)
+        return query
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in ('==', 'in'):
+            raise NotImplementedError(f"FakeQuery does not support '{op_string}'")
+        return self._copy(filters=self._filters + [(field_path, op_string, value)])
+
+    def order_by(self, field_path, direction='ASCENDING'):
+        return self._copy(order=self._order + [(field_path, direction == 'DESCENDING')])
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, snapshot):
+        return self._copy(start_after=snapshot)
+
+    def _matches(self, path):
+        if self._group is not None:
+            return len(path) % 2 == 0 and path[-2] == self._group
+        return path[:-1] == self._parent
+
+    def stream(self, transaction=None):
+        self._db.faults('query.stream')
+        with self._db.lock:
+            docs = [(path, dict(data)) for path, data in self._db.docs.items() if self._matches(path)]
+
+        for field, op, value in self._filters:
+            if op == '==':
+                docs = [(path, data) for path, data in docs if data.get(field) == value]
+            else:
+                docs = [(path, data) for path, data in docs if data.get(field) in value]
+
+        def sort_key(value):
+            # Missing values sort first, like Firestore's null ordering
+            return (value is not None, value if value is not None else 0)
+
+        docs.sort(key=lambda item: item[0][-1])
+        for field, descending in reversed(self._order):
+            docs.sort(key=lambda item: sort_key(item[1].get(field)), reverse=descending)
+
+        if self._start_after is not None:
+            ids = [path[-1] for path, _ in docs]
+            if self._start_after.id in ids:
+                docs = docs[ids.index(self._start_after.id) + 1:]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+
+        for path, data in docs:
+            if self._fields is not None:
+                data = {field: data[field] for field in self._fields if field in data}
+            yield FakeSnapshot(FakeDocument(self._db, path), data)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, path):
+        super().__init__(db, parent=path)
+        self.id = path[-1]
+
+    def document(self, document_id=None):
+        return FakeDocument(self._db, self._parent + (document_id or uuid.uuid4().hex[:20],))
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return datetime.now(timezone.utc), ref
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(('set', reference, data, merge))
+
+    def update(self, reference, data):
+        self._writes.append(('update', reference, data, True))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, False))
+
+    def commit(self):
+        self._db.faults('batch.commit')
+        self._db.apply(self._writes)
+        self._writes = []
+
+
+class FakeTransaction(FakeBatch):
+    # Optimistic transaction with the private hooks firestore.transactional
+    # drives: writes are buffered, and the commit aborts (so the wrapper
+    # retries) if a document read in the transaction has changed since.
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, db):
+        super().__init__(db)
+        self._id = None
+        self._reads = {}
+
+    def create(self, reference, data):
+        self._writes.append(('create', reference, data, False))
+
+    def get(self, reference):
+        return reference.get(transaction=self)
+
+    def _read(self, path, data):
+        self._reads.setdefault(path, data)
+
+    def _clean_up(self):
+        self._id = None
+        self._writes = []
+        self._reads = {}
+
+    def _begin(self, retry_id=None):
+        self._id = uuid.uuid4().bytes
+
+    def _rollback(self):
+        self._clean_up()
+
+    def _commit(self):
+        from google.api_core.exceptions import Aborted
+
+        self._db.faults('transaction.commit')
+        with self._db.lock:
+            for path, data in self._reads.items():
+                if self._db.docs.get(path) != data:
+                    raise Aborted(f"Transaction read of {'/'.join(path)} is stale")
+            self._db.apply(self._writes)
+        self._clean_up()
+        return []
+
+
+class FakeFirestore:
+    def __init__(self, faults=NO_FAULTS):
+        self.faults = faults
+        self.docs = {}
+        self.lock = threading.RLock()
+
+    def collection(self, name):
+        return FakeCollection(self, (name,))
+
+    def collection_group(self, name):
+        return FakeQuery(self, group=name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        self.faults('get_all')
+        for reference in references:
+            with self.lock:
+                data = self.docs.get(reference._path)
+                data = dict(data) if data is not None else None
+            if data is not None and field_paths is not None:
+                data = {field: data[field] for field in field_paths if field in data}
+            yield FakeSnapshot(reference, data)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    def apply(self, writes):
+        from google.api_core.exceptions import AlreadyExists, NotFound
+
+        with self.lock:
+            for operation, reference, data, merge in writes:
+                path = reference._path
+                if operation == 'delete':
+                    self.docs.pop(path, None)
+                elif operation == 'create' and path in self.docs:
+                    raise AlreadyExists(f"Document already exists: {reference.path}")
+                elif operation == 'update' and path not in self.docs:
+                    raise NotFound(f"No document to update: {reference.path}")
+                else:
+                    self.docs[path] = _resolve_sentinels(data, self.docs.get(path) if merge else None)
+
+
+# --- S3 ------------------------------------------------------------------------
+
+class FakeS3:
+    def __init__(self, faults=NO_FAULTS):
+        self.faults = faults
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, Config=None, Callback=None):
+        size = 0
+        while True:
+            block = fileobj.read(1024 * 1024)
+            if not block:
+                break
+            size += len(block)
+        self.faults('s3.upload_fileobj')
+        with self.lock:
+            self.objects[(bucket, key)] = size
+
+    def upload_file(self, file_path, bucket, key, ExtraArgs=None, Config=None):
+        with open(file_path, 'rb') as file:
+            self.upload_fileobj(file, bucket, key, ExtraArgs, Config)
+
+    def copy(self, copy_source, bucket, key, ExtraArgs=None, Config=None):
+        self.faults('s3.copy')
+        with self.lock:
+            self.objects[(bucket, key)] = self.objects.get((copy_source['Bucket'], copy_source['Key']), 0)
+
+    def generate_presigned_url(self, operation, Params=None, ExpiresIn=3600):
+        return f"https://{Params['Bucket']}.s3.amazonaws.com/{Params['Key']}?X-Amz-Signature=fake"
+
+    def delete_object(self, Bucket=None, Key=None):
+        self.faults('s3.delete_object')
+        with self.lock:
+            self.objects.pop((Bucket, Key), None)
+
+
+# --- AssemblyAI ----------------------------------------------------------------
+
+class FakeUtterance:
+    def __init__(self, speaker, text):
+        self.speaker = speaker
+        self.text = text
+
+
+class FakeTranscript:
+    def __init__(self, transcript_id, ready_at, utterances):
+        self.id = transcript_id
+        self._ready_at = ready_at
+        self._utterances = utterances
+        self.error = None
+
+    @property
+    def status(self):
+        return 'completed' if time.monotonic() >= self._ready_at else 'processing'
+
+    @property
+    def utterances(self):
+        return self._utterances if self.status == 'completed' else None
+
+
+class FakeTranscriptionConfig:
+    def __init__(self, **options):
+        self.options = options
+
+    def set_webhook(self, url, auth_header_name=None, auth_header_value=None):
+        self.options['webhook_url'] = url
+
+
+class FakeAssemblyAI:
+    # Module-shaped like `assemblyai`: Transcriber().submit, Transcript.get_by_id
+    def __init__(self, faults=NO_FAULTS, processing_s=0.5, utterances=20):
+        self.faults = faults
+        self.processing_s = processing_s
+        self.utterances = utterances
+        self.transcripts = {}
+        self._ids = itertools.count()
+        self.TranscriptionConfig = FakeTranscriptionConfig
+        assemblyai = self
+
+        class Transcriber:
+            def submit(self, audio, config=None):
+                return assemblyai._submit(audio)
+
+        class Transcript:
+            @staticmethod
+            def get_by_id(transcript_id):
+                assemblyai.faults('assemblyai.get')
+                return assemblyai.transcripts[transcript_id]
+
+        self.Transcriber = Transcriber
+        self.Transcript = Transcript
+
+    def _submit(self, audio):
+        self.faults('assemblyai.submit')
+        transcript_id = f"fake-transcript-{next(self._ids)}"
+        utterances = [FakeUtterance('AB'[i % 2], f"utterance {i} of {transcript_id} about the quarterly plan")
+                      for i in range(self.utterances)]
+        transcript = FakeTranscript(transcript_id, time.monotonic() + self.processing_s, utterances)
+        self.transcripts[transcript_id] = transcript
+        return transcript
+
+
+# --- Gemini --------------------------------------------------------------------
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    def __init__(self, faults=NO_FAULTS):
+        self.faults = faults
+
+    def generate_content(self, prompt):
+        self.faults('gemini.generate_content')
+        return FakeResponse(f"Summary of {len(prompt)} characters of transcript.")
+
+
+# --- MeetingBaaS and recording downloads ---------------------------------------
+
+class FakeHttpResponse:
+    def __init__(self, status_code, payload=None, body=b''):
+        self.status_code = status_code
+        self._payload = payload
+        self.raw = io.BytesIO(body)
+        self.headers = {}
+
+    @property
+    def text(self):
+        return str(self._payload)
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise FakeServiceError(f"HTTP {self.status_code}")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def webhook_transcript(topic='release', speakers=4, segments=200):
+    # 'transcript' of a complete webhook; distinct topics give distinct summaries
+    segments_out = []
+    for i in range(segments):
+        start = i * 4.0
+        words = [{'word': word, 'start': start + n * 0.3, 'end': start + n * 0.3 + 0.25}
+                 for n, word in enumerate(f"we agreed to ship the {topic} next week".split())]
+        segments_out.append({'speaker': f"Speaker {chr(65 + i % speakers)}", 'words': words})
+    return segments_out
+
+
+class FakeMeetingBaas:
+    # Shaped like http_client.HttpClient for the MeetingBaaS API
+    def __init__(self, faults=NO_FAULTS):
+        self.faults = faults
+        self._ids = itertools.count()
+
+    def request(self, method, path='', endpoint=None, **kwargs):
+        self.faults(f"meetingbaas.{method}")
+        if method == 'POST':
+            return FakeHttpResponse(200, {'bot_id': f"fake-bot-{next(self._ids)}-{uuid.uuid4().hex[:6]}"})
+        if method == 'GET' and path == 'meeting_data':
+            transcripts = [{'speaker': segment['speaker'],
+                            'words': [{'text': word['word'], 'start_time': word['start'], 'end_time': word['end']}
+                                      for word in segment['words']]}
+                           for segment in webhook_transcript()]
+            return FakeHttpResponse(200, {
+                'assets': [{'mp4_s3_path': 'https://recordings.example.com/fake.mp4'}],
+                'attendees': [{'name': 'Speaker A'}, {'name': 'Speaker B'}],
+                'editors': [{'video': {'transcripts': transcripts}}],
+            })
+        return FakeHttpResponse(200, {})
+
+    def get(self, path='', **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path='', **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def delete(self, path='', **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def stats(self):
+        return {}
+
+
+class FakeMediaHttp:
+    # Serves recordings of a fixed size for MediaTransfer downloads
+    def __init__(self, faults=NO_FAULTS, size=4 * 1024 * 1024):
+        self.faults = faults
+        self.body = b'\0' * size
+
+    def get(self, url, **kwargs):
+        self.faults('recording.get')
+        return FakeHttpResponse(200, body=self.body)
+
+    def stats(self):
+        return {}
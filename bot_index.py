@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from clients import lazy_module
+
+logger = logging.getLogger(__name__)
+
+firestore = lazy_module('firebase_admin.firestore')
+
+# Top-level collection mapping bot_id -> owning user_id
+BOT_INDEX_COLLECTION = 'bot_index'
+
+
+class BotIndex:
+    # Resolves the user that owns a bot with a single lookup instead of
+    # scanning every user's 'bots' subcollection. timed(op) wraps each
+    # Firestore call, e.g. to record its latency.
+    def __init__(self, db, max_entries=10000, retries=3, backoff=0.5, max_backoff=4.0, timed=None):
+        self.db = db
+        self.timed = timed or (lambda op: nullcontext())
+        self.max_entries = max_entries
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, bot_id, user_id):
+        with self._lock:
+            self._cache[bot_id] = user_id
+            self._cache.move_to_end(bot_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _cached(self, bot_id):
+        with self._lock:
+            user_id = self._cache.get(bot_id)
+            if user_id is not None:
+                self._cache.move_to_end(bot_id)
+            return user_id
+
+    def register(self, bot_id, user_id):
+        # Called when the bot document is created, so the webhook never has to search
+        with self.timed('bot_index_set'):
+            self.db.collection(BOT_INDEX_COLLECTION).document(bot_id).set({
+                'user_id': user_id,
+                'timestamp': firestore.SERVER_TIMESTAMP,
+            })
+        self._remember(bot_id, user_id)
+
+    def _lookup(self, bot_id):
+        from google.api_core.exceptions import FailedPrecondition
+
+        with self.timed('bot_index_get'):
+            index_doc = self.db.collection(BOT_INDEX_COLLECTION).document(bot_id).get()
+        if index_doc.exists:
+            return index_doc.to_dict().get('user_id')
+
+        # Bots created before the index existed: find them with one query on
+        # the 'bot_id' field and backfill the index entry. Collection-group
+        # queries need the COLLECTION_GROUP scope enabled for bots.bot_id
+        # (fieldOverrides in firestore.indexes.json).
+        query = self.db.collection_group('bots').where(
+            filter=firestore.FieldFilter('bot_id', '==', bot_id)).limit(1)
+        try:
+            with self.timed('bot_index_query'):
+                bot_docs = list(query.stream())
+        except FailedPrecondition as e:
+            logger.error(f"Bot index fallback for bot {bot_id} needs the collection-group index on "
+                         f"bots.bot_id, deploy firestore.indexes.json: {str(e)}")
+            raise
+        for bot_doc in bot_docs:
+            user_id = bot_doc.reference.parent.parent.id
+            with self.timed('bot_index_set'):
+                self.db.collection(BOT_INDEX_COLLECTION).document(bot_id).set({
+                    'user_id': user_id,
+                    'timestamp': firestore.SERVER_TIMESTAMP,
+                })
+            return user_id
+        return None
+
+    def resolve(self, bot_id):
+        # Returns the owner's user_id, or None if the bot is not found. Raises
+        # FailedPrecondition while the fallback query's index is missing.
+        from google.api_core.exceptions import FailedPrecondition
+
+        user_id = self._cached(bot_id)
+        if user_id is not None:
+            return user_id
+
+        # The webhook can race the index write in start_meeting_bot, so retry a
+        # bounded number of times with exponential backoff before giving up.
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                user_id = self._lookup(bot_id)
+            except FailedPrecondition:
+                # Retrying cannot help, and "not found" would hide the cause
+                raise
+            except Exception as e:
+                logger.error(f"Bot index lookup failed for bot {bot_id}: {str(e)}")
+                user_id = None
+
+            if user_id is not None:
+                self._remember(bot_id, user_id)
+                return user_id
+
+            if attempt < self.retries:
+                logger.warning(f"No user found for bot ID: {bot_id}. Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+        return None
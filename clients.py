@@ -0,0 +1,91 @@
+import importlib
+import os
+import threading
+import time
+
+_MISSING = object()
+
+
+class LazyModule:
+    # Stands in for a module and imports it on first attribute access
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module {self._name} ({state})>"
+
+
+def lazy_module(name):
+    return LazyModule(name)
+
+
+class LazyClient:
+    # Stands in for a registered client; the client is created the first time
+    # one of its attributes is used.
+    def __init__(self, registry, name):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __repr__(self):
+        return f"<lazy client {self._name}>"
+
+
+class ClientRegistry:
+    # Creates SDK clients on first use instead of at import time. Creation is
+    # guarded by a lock so concurrent first requests build a client once, and
+    # clients are dropped in forked children, which must not reuse the parent's
+    # gRPC channels or connection pools.
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._init_times = {}
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.RLock()
+        self._instances = {}
+        self._init_times = {}
+        self._pid = os.getpid()
+
+    def register(self, name, factory):
+        self._factories[name] = factory
+
+    def get(self, name):
+        if os.getpid() != self._pid:
+            self._reset()
+
+        instance = self._instances.get(name, _MISSING)
+        if instance is not _MISSING:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(name, _MISSING)
+            if instance is _MISSING:
+                started = time.perf_counter()
+                instance = self._factories[name]()
+                self._init_times[name] = time.perf_counter() - started
+                self._instances[name] = instance
+            return instance
+
+    def proxy(self, name):
+        return LazyClient(self, name)
+
+    def initialized(self):
+        # name -> seconds spent creating the client, for clients created so far
+        return dict(self._init_times)
@@ -0,0 +1,78 @@
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STATUS_COMPLETE = 'complete'
+STATUS_TIMED_OUT = 'timed_out'
+
+
+class CompletionRegistry:
+    # Bots whose call has ended and whose 'complete' webhook has not arrived
+    # yet. complete() runs the bot's callback on the webhook's own thread; one
+    # reaper thread runs the callback with STATUS_TIMED_OUT for bots that never
+    # complete. Nothing polls.
+    def __init__(self, timeout=2 * 60 * 60):
+        self.timeout = timeout
+        self._pending = {}
+        self._deadlines = []
+        self._cond = threading.Condition()
+        self._reaper = None
+
+    def expect(self, bot_id, callback, timeout=None):
+        # callback(status) runs exactly once, with STATUS_COMPLETE (or the status
+        # passed to complete()) or STATUS_TIMED_OUT
+        deadline = time.monotonic() + (timeout or self.timeout)
+        with self._cond:
+            self._pending[bot_id] = (callback, deadline)
+            heapq.heappush(self._deadlines, (deadline, bot_id))
+            self._ensure_reaper()
+            self._cond.notify()
+
+    def complete(self, bot_id, status=STATUS_COMPLETE):
+        # Returns False when nothing was waiting for this bot
+        with self._cond:
+            entry = self._pending.pop(bot_id, None)
+        if entry is None:
+            return False
+        self._run(bot_id, entry[0], status)
+        return True
+
+    def pending_count(self):
+        # Gauge: completions still outstanding in this process
+        with self._cond:
+            return len(self._pending)
+
+    def _run(self, bot_id, callback, status):
+        try:
+            callback(status)
+        except Exception as e:
+            logger.error(f"Completion callback for bot {bot_id} ({status}) failed: {str(e)}")
+
+    def _ensure_reaper(self):
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(target=self._reap, daemon=True, name="completion-reaper")
+            self._reaper.start()
+
+    def _reap(self):
+        while True:
+            expired = []
+            with self._cond:
+                now = time.monotonic()
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    deadline, bot_id = heapq.heappop(self._deadlines)
+                    entry = self._pending.get(bot_id)
+                    # Skip heap entries left behind by complete() or a re-registration
+                    if entry is not None and entry[1] == deadline:
+                        del self._pending[bot_id]
+                        expired.append((bot_id, entry[0]))
+                if not expired:
+                    wait = self._deadlines[0][0] - now if self._deadlines else None
+                    self._cond.wait(wait)
+                    continue
+
+            for bot_id, callback in expired:
+                logger.warning(f"Bot {bot_id} did not complete in time")
+                self._run(bot_id, callback, STATUS_TIMED_OUT)
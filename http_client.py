@@ -0,0 +1,141 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+# Only retried when the request may not have been acted on; a retried POST
+# /bots after a 500 could start a second bot.
+NON_IDEMPOTENT_RETRY_STATUSES = frozenset([429, 503])
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+
+class EndpointStats:
+    # Call count, failures and latency for one endpoint. Percentiles are taken
+    # over the most recent `window` calls.
+    def __init__(self, window=1024):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, elapsed, failed, retries):
+        self.calls += 1
+        self.errors += 1 if failed else 0
+        self.retries += retries
+        self.total_s += elapsed
+        self.max_s = max(self.max_s, elapsed)
+        self._recent.append(elapsed)
+
+    def snapshot(self):
+        recent = sorted(self._recent)
+
+        def percentile(p):
+            return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else 0.0
+
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'avg_ms': round(self.total_s / self.calls * 1000, 1) if self.calls else 0.0,
+            'p50_ms': round(percentile(0.50) * 1000, 1),
+            'p99_ms': round(percentile(0.99) * 1000, 1),
+            'max_ms': round(self.max_s * 1000, 1),
+        }
+
+
+class HttpClient:
+    # One keep-alive session per process for an upstream API: connections are
+    # pooled, every call has a timeout, and 429/5xx responses and connection
+    # failures are retried with jittered exponential backoff.
+    def __init__(self, base_url='', headers=None, timeout=(5, 30), retries=3, backoff=0.5,
+                 max_backoff=8.0, pool_size=10, on_request=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        # on_request(endpoint, elapsed, failed, retries) after every call, e.g. for metrics
+        self.on_request = on_request
+
+    def _url(self, path):
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}" if path else self.base_url
+
+    def _delay(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        # Full jitter keeps workers that failed together from retrying together
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _record(self, endpoint, elapsed, failed, retries):
+        with self._stats_lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats()
+            stats.record(elapsed, failed, retries)
+        if self.on_request:
+            self.on_request(endpoint, elapsed, failed, retries)
+
+    def request(self, method, path='', endpoint=None, **kwargs):
+        # Returns the final response, which may still be an error status;
+        # raises requests exceptions once retries are exhausted.
+        method = method.upper()
+        endpoint = endpoint or f"{method} /{path.lstrip('/')}"
+        retry_statuses = RETRY_STATUSES if method in IDEMPOTENT_METHODS else NON_IDEMPOTENT_RETRY_STATUSES
+        kwargs.setdefault('timeout', self.timeout)
+        url = self._url(path)
+
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # A read timeout on a POST may have been processed upstream
+                retryable = method in IDEMPOTENT_METHODS or isinstance(e, requests.ConnectTimeout)
+                if attempt >= self.retries or not retryable:
+                    self._record(endpoint, time.perf_counter() - started, True, attempt)
+                    raise
+                delay = self._delay(attempt)
+                logger.warning(f"{endpoint} failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code not in retry_statuses or attempt >= self.retries:
+                    self._record(endpoint, time.perf_counter() - started, response.status_code >= 400, attempt)
+                    return response
+                delay = self._delay(attempt, response)
+                logger.warning(f"{endpoint} returned {response.status_code}, retrying in {delay:.2f}s")
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, path='', **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path='', **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def delete(self, path='', **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def stats(self):
+        # endpoint -> call counts and latency percentiles
+        with self._stats_lock:
+            return {endpoint: stats.snapshot() for endpoint, stats in self._stats.items()}
@@ -0,0 +1,221 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+
+from app_logging import request_id_var
+from clients import lazy_module
+
+logger = logging.getLogger(__name__)
+
+firestore = lazy_module('firebase_admin.firestore')
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_WAITING = 'waiting'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+FINAL_STATES = (JOB_COMPLETED, JOB_FAILED)
+
+# Returned by a handler that parked its job on an external callback; the job is
+# continued later by submitting the next stage under the same job id.
+WAITING = object()
+
+
+class QueueFull(Exception):
+    pass
+
+
+class InMemoryQueueBackend:
+    # Default backend: a bounded in-process queue. Any object with the same
+    # put/get interface (Redis list, SQS, Cloud Tasks...) can be plugged in.
+    def __init__(self, maxsize=100):
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, job):
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise QueueFull("Job queue is full")
+
+    def get(self, timeout=None):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+class Job:
+    def __init__(self, job_id, kind, user_id, payload):
+        self.job_id = job_id
+        self.kind = kind
+        self.user_id = user_id
+        self.payload = payload
+        # Logs written while the job runs carry the id of the request that queued it
+        self.request_id = request_id_var.get()
+
+
+class JobRunner:
+    # Runs registered job handlers on a bounded pool of worker threads and
+    # records their progress in users/{user_id}/jobs/{job_id}, or in
+    # {collection}/{job_id} for jobs that do not belong to a user.
+    # timed(op) wraps each Firestore call, e.g. to record its latency.
+    def __init__(self, db, max_workers=4, backend=None, collection=None, timed=None):
+        self.db = db
+        self.timed = timed or (lambda op: nullcontext())
+        self.collection = collection
+        self.max_workers = max_workers
+        self.backend = backend or InMemoryQueueBackend()
+        self.handlers = {}
+        self._workers = []
+        self._lock = threading.Lock()
+        self._updated = threading.Condition()
+        self._local_state = {}
+        self.retain_finished_s = 600
+        # Jobs parked on another instance's callback may never update here again
+        self.retain_idle_s = 3600
+        self.in_flight = 0
+
+    def register(self, kind, handler):
+        # handler(job, progress) -> result dict or WAITING; progress(stage) records the current stage
+        self.handlers[kind] = handler
+
+    def job_ref(self, user_id, job_id):
+        if self.collection:
+            return self.db.collection(self.collection).document(job_id)
+        return self.db.collection('users').document(user_id).collection('jobs').document(job_id)
+
+    def _start_workers(self):
+        # Workers are started on first use so importing the app stays cheap
+        with self._lock:
+            # Threads do not survive a fork, so count only live workers
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, daemon=True,
+                                          name=f"job-worker-{len(self._workers)}")
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, kind, user_id, payload, job_id=None):
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        fields = {'kind': kind, 'status': JOB_QUEUED}
+        if job_id is None:
+            fields.update({'stage': None, 'created_at': firestore.SERVER_TIMESTAMP})
+        job = Job(job_id or uuid.uuid4().hex, kind, user_id, payload)
+        self._update(job, fields)
+        self._start_workers()
+        try:
+            self.backend.put(job)
+        except QueueFull:
+            self._update(job, {'status': JOB_FAILED, 'error': 'Job queue is full'})
+            raise
+        return job.job_id
+
+    def _update(self, job, fields):
+        fields = dict(fields, updated_at=firestore.SERVER_TIMESTAMP)
+        with self.timed('job_update'):
+            self.job_ref(job.user_id, job.job_id).set(fields, merge=True)
+
+        # Keep a local copy so streams on this instance are notified without polling
+        with self._updated:
+            state = self._local_state.setdefault(job.job_id, {'version': 0, 'user_id': job.user_id})
+            state.update({k: v for k, v in fields.items() if v is not firestore.SERVER_TIMESTAMP})
+            state['version'] += 1
+            state['touched_at'] = time.monotonic()
+            if state.get('status') in FINAL_STATES:
+                state.setdefault('finished_at', time.monotonic())
+            self._prune()
+            self._updated.notify_all()
+
+    def _prune(self):
+        # Drop local state of jobs that finished or stopped updating a while
+        # ago; Firestore keeps the record
+        now = time.monotonic()
+        finished_cutoff = now - self.retain_finished_s
+        idle_cutoff = now - self.retain_idle_s
+        for job_id in [job_id for job_id, state in self._local_state.items()
+                       if state.get('finished_at', now) < finished_cutoff or state['touched_at'] < idle_cutoff]:
+            del self._local_state[job_id]
+
+    def _work(self):
+        while True:
+            job = self.backend.get(timeout=1.0)
+            if job is None:
+                continue
+            with self._lock:
+                self.in_flight += 1
+            token = request_id_var.set(job.request_id)
+            try:
+                self._run(job)
+            except Exception as e:
+                # Recording the job's state failed; keep the worker alive for the next job
+                logger.error(f"Job {job.job_id} could not be recorded: {str(e)}")
+            finally:
+                request_id_var.reset(token)
+                with self._lock:
+                    self.in_flight -= 1
+
+    def _run(self, job):
+        handler = self.handlers[job.kind]
+        self._update(job, {'status': JOB_RUNNING, 'started_at': firestore.SERVER_TIMESTAMP})
+        started = time.monotonic()
+
+        def progress(stage, **fields):
+            logger.info(f"Job {job.job_id}: {stage}")
+            self._update(job, dict(fields, stage=stage))
+
+        try:
+            result = handler(job, progress)
+            if result is WAITING:
+                self._update(job, {'status': JOB_WAITING})
+                return
+            self._update(job, {
+                'status': JOB_COMPLETED,
+                'stage': 'done',
+                'result': result or {},
+                'duration_s': round(time.monotonic() - started, 3),
+            })
+        except Exception as e:
+            logger.error(f"Job {job.job_id} failed: {str(e)}")
+            self._update(job, {
+                'status': JOB_FAILED,
+                'error': str(e),
+                'duration_s': round(time.monotonic() - started, 3),
+            })
+
+    def queue_depth(self):
+        return self.backend.qsize() if hasattr(self.backend, 'qsize') else 0
+
+    def get_status(self, user_id, job_id):
+        with self.timed('job_status'):
+            job_doc = self.job_ref(user_id, job_id).get()
+        if not job_doc.exists:
+            return None
+        status = job_doc.to_dict()
+        status['job_id'] = job_id
+        return status
+
+    def wait_for_update(self, job_id, last_version, timeout, user_id=None):
+        # Returns (version, state) for jobs running on this instance, or None if
+        # the job is unknown here and the caller has to read Firestore instead.
+        # Another user's job is treated as unknown.
+        with self._updated:
+            state = self._local_state.get(job_id)
+            if state is None or (user_id is not None and state['user_id'] != user_id):
+                return None
+            if state['version'] <= last_version:
+                self._updated.wait(timeout)
+                state = self._local_state.get(job_id)
+                if state is None:
+                    return None
+            state = dict(state)
+            for key in ('user_id', 'touched_at', 'finished_at'):
+                state.pop(key, None)
+            return state['version'], state
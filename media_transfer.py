@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import re
+from urllib.parse import unquote, urlparse
+
+from http_client import HttpClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_CONCURRENCY = 4
+
+# https://bucket.s3.amazonaws.com/key, https://bucket.s3.region.amazonaws.com/key
+_VIRTUAL_HOSTED = re.compile(r'^(?P<bucket>[^.]+(?:\.[^.]+)*?)\.s3(?:[.-][a-z0-9-]+)?\.amazonaws\.com$')
+# https://s3.region.amazonaws.com/bucket/key
+_PATH_STYLE = re.compile(r'^s3(?:[.-][a-z0-9-]+)?\.amazonaws\.com$')
+
+
+def parse_s3_url(url):
+    # Returns (bucket, key) when the URL points straight at an S3 object, else None.
+    # Presigned URLs are left alone: their signature is what grants access.
+    parsed = urlparse(url)
+    if parsed.scheme == 's3':
+        return parsed.netloc, parsed.path.lstrip('/')
+    if parsed.scheme != 'https' or 'X-Amz-Signature' in parsed.query or 'Signature' in parsed.query:
+        return None
+
+    host = parsed.netloc.lower()
+    path = unquote(parsed.path.lstrip('/'))
+    match = _VIRTUAL_HOSTED.match(host)
+    if match and path:
+        return match.group('bucket'), path
+    if _PATH_STYLE.match(host) and '/' in path:
+        bucket, key = path.split('/', 1)
+        return bucket, key
+    return None
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class HashingReader:
+    # Read-only file object over a request stream that hashes the bytes as
+    # boto3 reads them, so the upload and the content hash take a single pass
+    def __init__(self, stream, max_bytes=None):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise UploadTooLarge(f"Upload is larger than {self.max_bytes} bytes")
+        self._digest.update(data)
+        return data
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+class MediaTransfer:
+    # Moves meeting recordings into our bucket without holding them in memory
+    # or on disk: the download is read in parts and each part is uploaded as
+    # soon as it is read, with up to `concurrency` parts in flight.
+    def __init__(self, s3, bucket, part_size=DEFAULT_PART_SIZE, concurrency=DEFAULT_CONCURRENCY,
+                 timeout=(10, 60), http=None, copy_buckets=()):
+        self.s3 = s3
+        self.bucket = bucket
+        # Buckets recordings may be copied from server-side (MeetingBaaS's own).
+        # Our bucket is never a source: a webhook could otherwise publish any
+        # private object in it by sending its URL.
+        self.copy_buckets = frozenset(copy_buckets) - {bucket}
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        # Pooled, retrying session for downloads
+        self.http = http or HttpClient(timeout=timeout)
+        self._transfer_config = None
+
+    @property
+    def transfer_config(self):
+        # boto3 is imported on first transfer rather than at module load to keep cold starts cheap
+        if self._transfer_config is None:
+            from boto3.s3.transfer import TransferConfig
+
+            self._transfer_config = TransferConfig(
+                multipart_threshold=self.part_size,
+                multipart_chunksize=self.part_size,
+                max_concurrency=self.concurrency,
+            )
+        return self._transfer_config
+
+    def public_url(self, key):
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+    def upload_stream(self, stream, key, content_type='audio/mpeg', max_bytes=None):
+        # Multipart upload straight from a stream: at most part_size * concurrency
+        # bytes are buffered and nothing touches the disk. Returns the
+        # s3:// path and the sha256 of the uploaded bytes.
+        reader = HashingReader(stream, max_bytes)
+        self.s3.upload_fileobj(reader, self.bucket, key,
+                               ExtraArgs={'ContentType': content_type}, Config=self.transfer_config)
+        return f"s3://{self.bucket}/{key}", reader.hexdigest()
+
+    def presigned_url(self, key, expires_in=3600):
+        # Lets a third party (AssemblyAI) fetch a private object directly from S3
+        return self.s3.generate_presigned_url('get_object', Params={'Bucket': self.bucket, 'Key': key},
+                                              ExpiresIn=expires_in)
+
+    def copy_from_url(self, url, key, content_type='video/mp4', public=True):
+        from botocore.exceptions import ClientError
+
+        extra_args = {'ContentType': content_type}
+        if public:
+            # Set the ACL with the upload instead of a separate put_object_acl call
+            extra_args['ACL'] = 'public-read'
+
+        source = parse_s3_url(url)
+        if source is not None and source[0] not in self.copy_buckets:
+            # Anything else is fetched over HTTP, with no more access than the URL grants anyone
+            source = None
+        if source is not None:
+            try:
+                # Server-side copy: the bytes never leave S3
+                self.s3.copy({'Bucket': source[0], 'Key': source[1]}, self.bucket, key,
+                             ExtraArgs=extra_args, Config=self.transfer_config)
+                return self.public_url(key)
+            except ClientError as e:
+                logger.warning(f"Server-side copy from {source[0]}/{source[1]} failed, streaming instead: {e}")
+
+        with self.http.get(url, stream=True, timeout=self.timeout, endpoint='GET recording') as response:
+            response.raise_for_status()
+            # Undo any Content-Encoding while streaming
+            response.raw.decode_content = True
+            self.s3.upload_fileobj(response.raw, self.bucket, key,
+                                   ExtraArgs=extra_args, Config=self.transfer_config)
+        return self.public_url(key)
@@ -0,0 +1,160 @@
+import logging
+
+from clients import lazy_module
+
+logger = logging.getLogger(__name__)
+
+firestore = lazy_module('firebase_admin.firestore')
+
+# users/{uid}/bots/{bot_id}/meeting_summary/{summary_id}/transcript_chunks/{index}
+TRANSCRIPT_CHUNKS_COLLECTION = 'transcript_chunks'
+# Firestore allows 500 writes and 10 MiB per commit; keep some headroom on the size
+MAX_BATCH_WRITES = 500
+MAX_BATCH_BYTES = 9 * 1024 * 1024
+# Well under Firestore's 1 MiB document limit
+DEFAULT_CHUNK_LINES = 500
+DEFAULT_CHUNK_BYTES = 512 * 1024
+
+
+def chunk_lines(lines, max_lines=DEFAULT_CHUNK_LINES, max_bytes=DEFAULT_CHUNK_BYTES):
+    # Fixed-size chunks of transcript lines; a chunk is closed early when it
+    # would grow past max_bytes. Works on any iterable.
+    chunk = []
+    size = 0
+    for line in lines:
+        line_size = len(line.encode('utf-8')) + 8
+        if chunk and (len(chunk) >= max_lines or size + line_size > max_bytes):
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(line)
+        size += line_size
+    if chunk:
+        yield chunk
+
+
+def estimated_size(value):
+    # Rough Firestore storage size of a field value, after its size rules
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if isinstance(value, dict):
+        return sum(estimated_size(key) + estimated_size(item) for key, item in value.items()) + 32
+    if isinstance(value, (list, tuple)):
+        return sum(estimated_size(item) for item in value)
+    return 8
+
+
+def pack_batches(writes, final_writes=()):
+    # Groups (ref, data, merge) writes into batches under both commit limits.
+    # final_writes always share the last batch, which is committed last.
+    batches = []
+    batch = []
+    size = 0
+    for write in writes:
+        write_size = estimated_size(write[1])
+        if batch and (len(batch) >= MAX_BATCH_WRITES or size + write_size > MAX_BATCH_BYTES):
+            batches.append(batch)
+            batch = []
+            size = 0
+        batch.append(write)
+        size += write_size
+
+    final_size = sum(estimated_size(write[1]) for write in final_writes)
+    if batch and (len(batch) + len(final_writes) > MAX_BATCH_WRITES or size + final_size > MAX_BATCH_BYTES):
+        batches.append(batch)
+        batch = []
+    batch.extend(final_writes)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class MeetingStore:
+    # Meeting summaries with their transcript split into chunk documents, so a
+    # long meeting never hits the document size limit. The summary, its chunks,
+    # the bot status and the user's latest-summary copy are written in one batch.
+    def __init__(self, db, chunk_lines=DEFAULT_CHUNK_LINES, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        self.db = db
+        self.chunk_lines = chunk_lines
+        self.chunk_bytes = chunk_bytes
+
+    def latest_ref(self, user_id):
+        # users/{user_id}/latest/meeting_summary holds the newest summary without its transcript
+        return self.db.collection('users').document(user_id).collection('latest').document('meeting_summary')
+
+    def summary_ref(self, user_id, bot_id, summary_id):
+        return (self.db.collection('users').document(user_id).collection('bots').document(bot_id)
+                .collection('meeting_summary').document(summary_id))
+
+    def save(self, user_id, bot_id, bot_doc_ref, summary, transcription=(), status=None):
+        # summary is the meeting_summary document without 'transcription'.
+        # Returns the new summary's DocumentReference.
+        summary_ref = bot_doc_ref.collection('meeting_summary').document()
+        chunks_ref = summary_ref.collection(TRANSCRIPT_CHUNKS_COLLECTION)
+
+        writes = []
+        line_count = 0
+        for index, lines in enumerate(chunk_lines(transcription, self.chunk_lines, self.chunk_bytes)):
+            writes.append((chunks_ref.document(f"{index:05d}"), {'index': index, 'lines': lines}, False))
+            line_count += len(lines)
+
+        # user_id and bot_id let find_latest use one collection-group query
+        summary = dict(summary, user_id=user_id, bot_id=bot_id,
+                       transcript_chunks=len(writes), transcript_lines=line_count)
+        # The summary, latest copy and status go last so, should the chunks need
+        # more than one batch, readers never see a summary with missing chunks
+        final_writes = [
+            (summary_ref, summary, False),
+            (self.latest_ref(user_id), dict(summary, bot_id=bot_id, summary_id=summary_ref.id), False),
+        ]
+        if status is not None:
+            final_writes.append((bot_doc_ref, {'status': status}, True))
+
+        for batch_writes in pack_batches(writes, final_writes):
+            batch = self.db.batch()
+            for ref, data, merge in batch_writes:
+                batch.set(ref, data, merge=merge)
+            batch.commit()
+        return summary_ref
+
+    def find_latest(self, user_id):
+        # Newest meeting_summary snapshot written by save() for this user, or None.
+        # Needs the collection-group index meeting_summary (user_id ASC, timestamp DESC)
+        # from firestore.indexes.json; raises FailedPrecondition until it is deployed.
+        query = (self.db.collection_group('meeting_summary')
+                 .where(filter=firestore.FieldFilter('user_id', '==', user_id))
+                 .order_by('timestamp', direction=firestore.Query.DESCENDING)
+                 .limit(1))
+        return next(iter(query.stream()), None)
+
+    def iter_transcript(self, summary_ref):
+        # Streams transcript lines one chunk document at a time
+        chunks = summary_ref.collection(TRANSCRIPT_CHUNKS_COLLECTION).order_by('index').stream()
+        for chunk in chunks:
+            yield from chunk.to_dict().get('lines') or []
+
+    def with_transcript(self, summary, summary_ref):
+        if 'transcription' in summary:
+            return summary
+        if 'transcript_chunks' in summary:
+            return dict(summary, transcription=list(self.iter_transcript(summary_ref)))
+        # Summaries written before chunking keep 'transcription' inline in the
+        # summary document, but not in the latest-summary copy
+        snapshot = summary_ref.get()
+        transcription = (snapshot.to_dict() or {}).get('transcription', []) if snapshot.exists else []
+        return dict(summary, transcription=transcription)
+
+    def load(self, snapshot):
+        # meeting_summary snapshot -> dict with the full transcription
+        return self.with_transcript(snapshot.to_dict(), snapshot.reference)
+
+    def load_latest(self, user_id):
+        # Returns the user's latest summary with its transcription, or None
+        latest_doc = self.latest_ref(user_id).get()
+        if not latest_doc.exists:
+            return None
+        latest = latest_doc.to_dict()
+        if latest.get('bot_id') and latest.get('summary_id'):
+            latest = self.with_transcript(latest, self.summary_ref(user_id, latest['bot_id'], latest['summary_id']))
+        return latest
+
@@ -0,0 +1,91 @@
+import contextvars
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+class StageGraph:
+    # A few named stages with dependencies. Each stage starts as soon as the
+    # stages it depends on have finished, so independent stages run in
+    # parallel. func(results) gets the results of all finished stages so far.
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+
+    def add(self, name, func, after=()):
+        for dependency in after:
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self.stages[name] = (func, tuple(after))
+        return self
+
+    def run(self, on_start=None):
+        # Returns (results, timings). The first failing stage's exception is
+        # raised once the stages already running have finished.
+        results = {}
+        timings = {}
+        started = time.perf_counter()
+        remaining = dict(self.stages)
+        running = {}
+
+        def timed(name, func):
+            stage_started = time.perf_counter()
+            try:
+                return func(results)
+            finally:
+                finished = time.perf_counter()
+                timings[name] = {
+                    'start_ms': round((stage_started - started) * 1000, 1),
+                    'duration_ms': round((finished - stage_started) * 1000, 1),
+                }
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.stages)),
+                                thread_name_prefix=f"{self.name}-stage") as executor:
+            error = None
+            while remaining or running:
+                if error is None:
+                    for name, (func, after) in list(remaining.items()):
+                        if all(dependency in results for dependency in after):
+                            del remaining[name]
+                            if on_start:
+                                on_start(name)
+                            # A copy of the caller's context keeps the request id in stage logs
+                            context = contextvars.copy_context()
+                            running[executor.submit(context.run, timed, name, func)] = name
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        if error is None:
+                            error = e
+                            logger.error(f"{self.name}: stage '{name}' failed: {str(e)}")
+
+            if error is not None:
+                raise error
+
+        timings['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return results, timings
+
+    def critical_path(self, timings):
+        # Walks back from the stage that finished last through the dependency
+        # that finished last before it
+        def end(name):
+            return timings[name]['start_ms'] + timings[name]['duration_ms']
+
+        stage_names = [name for name in self.stages if name in timings]
+        if not stage_names:
+            return []
+        path = [max(stage_names, key=end)]
+        while True:
+            after = [dependency for dependency in self.stages[path[-1]][1] if dependency in timings]
+            if not after:
+                break
+            path.append(max(after, key=end))
+        return list(reversed(path))
@@ -0,0 +1,83 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from clients import lazy_module
+
+logger = logging.getLogger(__name__)
+
+firestore = lazy_module('firebase_admin.firestore')
+
+RESULT_CACHE_COLLECTION = 'result_cache'
+
+# Keep cached values comfortably under Firestore's 1 MiB document limit
+MAX_PERSISTED_BYTES = 900 * 1024
+
+
+def hash_text(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        # Separator so ('ab', 'c') and ('a', 'bc') hash differently
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResultCache:
+    # Content-addressed cache for transcription and summary results: a bounded
+    # in-process LRU in front of result_cache/{namespace}:{key} documents.
+    # timed(op) wraps each Firestore call, e.g. to record its latency.
+    def __init__(self, db, max_entries=256, timed=None):
+        self.db = db
+        self.timed = timed or (lambda op: nullcontext())
+        self.max_entries = max_entries
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _ref(self, namespace, key):
+        return self.db.collection(RESULT_CACHE_COLLECTION).document(f"{namespace}:{key}")
+
+    def _remember(self, cache_key, value):
+        with self._lock:
+            self._local[cache_key] = value
+            self._local.move_to_end(cache_key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def get(self, namespace, key):
+        cache_key = (namespace, key)
+        with self._lock:
+            if cache_key in self._local:
+                self._local.move_to_end(cache_key)
+                return self._local[cache_key]
+
+        try:
+            with self.timed('result_cache_get'):
+                cached_doc = self._ref(namespace, key).get()
+        except Exception as e:
+            logger.error(f"Result cache read failed for {namespace}:{key}: {str(e)}")
+            return None
+        if not cached_doc.exists:
+            return None
+
+        value = cached_doc.to_dict().get('value')
+        self._remember(cache_key, value)
+        return value
+
+    def set(self, namespace, key, value):
+        self._remember((namespace, key), value)
+
+        size = len(repr(value).encode('utf-8'))
+        if size > MAX_PERSISTED_BYTES:
+            logger.info(f"Not persisting {namespace}:{key} to the result cache ({size} bytes)")
+            return
+        try:
+            with self.timed('result_cache_set'):
+                self._ref(namespace, key).set({
+                    'value': value,
+                    'timestamp': firestore.SERVER_TIMESTAMP,
+                })
+        except Exception as e:
+            logger.error(f"Result cache write failed for {namespace}:{key}: {str(e)}")
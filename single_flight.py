@@ -0,0 +1,147 @@
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from clients import lazy_module
+
+logger = logging.getLogger(__name__)
+
+firestore = lazy_module('firebase_admin.firestore')
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first caller
+    # runs func, the others wait for it and get its result or its exception.
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for the running call for {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+def _take_expired_lease(transaction, ref, lease):
+    # Run through firestore.transactional, which retries on contention
+    snapshot = ref.get(transaction=transaction)
+    if snapshot.exists and (snapshot.to_dict() or {}).get('expires_at', 0) > time.time():
+        return False
+    transaction.set(ref, lease)
+    return True
+
+
+def _extend_lease(transaction, ref, token, expires_at):
+    snapshot = ref.get(transaction=transaction)
+    if not snapshot.exists or (snapshot.to_dict() or {}).get('owner') != token:
+        return False
+    transaction.update(ref, {'expires_at': expires_at})
+    return True
+
+
+class FirestoreLease:
+    # A short-lived lock shared by all instances: {collection}/{key} holds the
+    # owner's token and an expiry, so a crashed owner only blocks others for `ttl`.
+    def __init__(self, db, collection, ttl=120):
+        self.db = db
+        self.collection = collection
+        self.ttl = ttl
+
+    def _ref(self, key):
+        return self.db.collection(self.collection).document(key)
+
+    def acquire(self, key):
+        # Returns the owner token, or None while someone else holds the lease
+        from google.api_core.exceptions import AlreadyExists
+
+        token = uuid.uuid4().hex
+        lease = {'owner': token, 'expires_at': time.time() + self.ttl}
+        ref = self._ref(key)
+        try:
+            ref.create(lease)
+            return token
+        except AlreadyExists:
+            pass
+
+        snapshot = ref.get()
+        if snapshot.exists and (snapshot.to_dict() or {}).get('expires_at', 0) > time.time():
+            return None
+        # The holder released it or died without releasing it
+        if firestore.transactional(_take_expired_lease)(self.db.transaction(), ref, lease):
+            logger.info(f"Took over expired lease {self.collection}/{key}")
+            return token
+        return None
+
+    def renew(self, key, token):
+        # Pushes the expiry back by ttl; False once the lease belongs to someone else
+        expires_at = time.time() + self.ttl
+        return firestore.transactional(_extend_lease)(self.db.transaction(), self._ref(key), token, expires_at)
+
+    @contextmanager
+    def hold(self, key, token, interval=None):
+        # Renews the lease every `interval` seconds (ttl / 3 by default) while
+        # the body runs, so work that outlasts the ttl keeps the lease
+        interval = interval or self.ttl / 3
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(interval):
+                try:
+                    if not self.renew(key, token):
+                        logger.warning(f"Lost lease {self.collection}/{key} before the work finished")
+                        return
+                except Exception as e:
+                    logger.error(f"Could not renew lease {self.collection}/{key}: {str(e)}")
+
+        thread = threading.Thread(target=contextvars.copy_context().run, args=(heartbeat,), daemon=True,
+                                  name=f"lease-{self.collection}")
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def release(self, key, token):
+        # Only the owner deletes the lease; an expired one may already belong to someone else
+        ref = self._ref(key)
+        try:
+            snapshot = ref.get()
+            if snapshot.exists and (snapshot.to_dict() or {}).get('owner') == token:
+                ref.delete()
+        except Exception as e:
+            logger.error(f"Could not release lease {self.collection}/{key}: {str(e)}")
@@ -0,0 +1,189 @@
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+
+from clients import lazy_module
+
+logger = logging.getLogger(__name__)
+
+firestore = lazy_module('firebase_admin.firestore')
+
+# Firestore collection used by the shared store
+BOT_STATUS_COLLECTION = 'bot_status'
+
+
+class Subscription:
+    # Handed to SSE streams: get() blocks for the next status, close() detaches
+    def __init__(self, on_close=None):
+        self._queue = queue.Queue()
+        self._on_close = on_close
+
+    def put(self, status):
+        self._queue.put(status)
+
+    def get(self, timeout=None):
+        # Raises queue.Empty when nothing arrived within the timeout
+        return self._queue.get(timeout=timeout)
+
+    def close(self):
+        if self._on_close:
+            self._on_close(self)
+            self._on_close = None
+
+
+class InMemoryStatusStore:
+    # Process-local store. Entries expire ttl seconds after their last update
+    # so finished bots do not accumulate for the lifetime of the worker.
+    def __init__(self, ttl=6 * 60 * 60, sweep_interval=60):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._entries = {}
+        self._subscribers = defaultdict(list)
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def _sweep(self, now):
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        for bot_id in [bot_id for bot_id, entry in self._entries.items() if entry['expires'] < now]:
+            del self._entries[bot_id]
+
+    def register(self, bot_id):
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            self._entries[bot_id] = {"status": None, "created_at": None, "expires": now + self.ttl}
+
+    def is_tracked(self, bot_id):
+        with self._lock:
+            entry = self._entries.get(bot_id)
+            return entry is not None and entry['expires'] >= time.monotonic()
+
+    def get(self, bot_id):
+        with self._lock:
+            entry = self._entries.get(bot_id)
+            if entry is None or entry['expires'] < time.monotonic():
+                return None
+            return {"status": entry['status'], "created_at": entry['created_at']}
+
+    def publish(self, bot_id, status, created_at=None):
+        # Returns False for bots this store does not track
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            if bot_id not in self._entries:
+                return False
+            self._entries[bot_id] = {"status": status, "created_at": created_at, "expires": now + self.ttl}
+            subscribers = list(self._subscribers.get(bot_id, []))
+        for subscriber in subscribers:
+            subscriber.put(status)
+        return True
+
+    def subscribe(self, bot_id):
+        subscription = Subscription(on_close=lambda sub: self._unsubscribe(bot_id, sub))
+        with self._lock:
+            self._subscribers[bot_id].append(subscription)
+            entry = self._entries.get(bot_id)
+            current_status = entry['status'] if entry else None
+        # Replay the current status so nothing published before subscribing is lost
+        if current_status is not None:
+            subscription.put(current_status)
+        return subscription
+
+    def _unsubscribe(self, bot_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(bot_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(bot_id, None)
+
+
+class FirestoreStatusStore:
+    # Shared store: every worker and instance reads and watches the same
+    # bot_status/{bot_id} documents, so the webhook and the SSE stream do not
+    # have to land on the same process. Configure a Firestore TTL policy on
+    # 'expires_at' to have expired documents removed. timed(op) wraps each
+    # Firestore call, e.g. to record its latency.
+    def __init__(self, db, ttl=6 * 60 * 60, timed=None):
+        self.db = db
+        self.ttl = ttl
+        self.timed = timed or (lambda op: nullcontext())
+
+    def _ref(self, bot_id):
+        return self.db.collection(BOT_STATUS_COLLECTION).document(bot_id)
+
+    def _expires_at(self):
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+
+    def register(self, bot_id):
+        with self.timed('bot_status_set'):
+            self._ref(bot_id).set({
+                "status": None,
+                "created_at": None,
+                "expires_at": self._expires_at(),
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            })
+
+    def is_tracked(self, bot_id):
+        return self.get(bot_id) is not None
+
+    def get(self, bot_id):
+        with self.timed('bot_status_get'):
+            snapshot = self._ref(bot_id).get()
+        if not snapshot.exists:
+            return None
+        data = snapshot.to_dict()
+        expires_at = data.get('expires_at')
+        if expires_at and expires_at < datetime.now(timezone.utc):
+            return None
+        return {"status": data.get('status'), "created_at": data.get('created_at')}
+
+    def publish(self, bot_id, status, created_at=None):
+        from google.api_core.exceptions import NotFound
+
+        try:
+            # update() fails for bots that were never registered
+            with self.timed('bot_status_update'):
+                self._ref(bot_id).update({
+                    "status": status,
+                    "created_at": created_at,
+                    "expires_at": self._expires_at(),
+                    "updated_at": firestore.SERVER_TIMESTAMP,
+                })
+        except NotFound:
+            return False
+        return True
+
+    def subscribe(self, bot_id):
+        watch = None
+
+        def on_close(subscription):
+            if watch is not None:
+                watch.unsubscribe()
+
+        subscription = Subscription(on_close=on_close)
+
+        def on_snapshot(snapshots, changes, read_time):
+            # The first snapshot carries the current status, later ones each change
+            for snapshot in snapshots:
+                status = (snapshot.to_dict() or {}).get('status')
+                if status is not None:
+                    subscription.put(status)
+
+        watch = self._ref(bot_id).on_snapshot(on_snapshot)
+        return subscription
+
+
+def create_status_store(db, backend=None, ttl=6 * 60 * 60, timed=None):
+    # BOT_STATUS_STORE=firestore shares statuses between workers and instances
+    if backend == 'firestore':
+        return FirestoreStatusStore(db, ttl=ttl, timed=timed)
+    if backend not in (None, '', 'memory'):
+        logger.warning(f"Unknown bot status store '{backend}', using the in-memory store")
+    return InMemoryStatusStore(ttl=ttl)
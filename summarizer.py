@@ -0,0 +1,115 @@
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio, good enough to keep chunks under budget
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def chunk_statements(statements, max_tokens):
+    # Packs consecutive speaker turns into chunks under max_tokens. A turn is
+    # only split (on word boundaries) when it is larger than a whole chunk.
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for statement in statements:
+        tokens = estimate_tokens(statement)
+        if tokens > max_tokens:
+            pieces = _split_statement(statement, max_tokens)
+        else:
+            pieces = [statement]
+
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(current)
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += piece_tokens
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_statement(statement, max_tokens):
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    piece = []
+    length = 0
+    for word in statement.split(' '):
+        if piece and length + len(word) + 1 > max_chars:
+            pieces.append(' '.join(piece))
+            piece = []
+            length = 0
+        piece.append(word)
+        length += len(word) + 1
+    if piece:
+        pieces.append(' '.join(piece))
+    return pieces
+
+
+class Summarizer:
+    # Map-reduce summarization: short transcripts get a single call, long ones
+    # are chunked on speaker turns, the chunks are summarized in parallel and
+    # the partial summaries are merged `fan_in` at a time until one is left.
+    def __init__(self, model, max_chunk_tokens=32000, max_workers=4, fan_in=8):
+        self.model = model
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_workers = max_workers
+        self.fan_in = fan_in
+
+    def _generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        return response.text.strip() if hasattr(response, 'text') else "No summary generated."
+
+    def _map(self, func, items):
+        if len(items) == 1:
+            return [func(items[0])]
+        # Each call runs in a copy of the caller's context so its logs keep the request id
+        contexts = [contextvars.copy_context() for _ in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            return list(executor.map(lambda context, item: context.run(func, item), contexts, items))
+
+    def summarize(self, statements, build_prompt, transcript_kind='meeting'):
+        # build_prompt(transcript) gives the prompt for a transcript small enough for one call.
+        # statements may be any iterable (e.g. transcript.iter_statements); it is read once.
+        chunks = chunk_statements(statements, self.max_chunk_tokens)
+        if len(chunks) <= 1:
+            return self._generate(build_prompt("\n".join(chunks[0]) if chunks else ""))
+
+        logger.info(f"Summarizing {len(chunks)} transcript chunks with up to {self.max_workers} in parallel")
+        total = len(chunks)
+
+        def summarize_chunk(indexed_chunk):
+            index, chunk = indexed_chunk
+            prompt = (f"The following is part {index + 1} of {total} of a {transcript_kind} transcript. "
+                      f"Summarize this part, keeping decisions, action items and who said them:\n"
+                      + "\n".join(chunk))
+            return self._generate(prompt)
+
+        summaries = self._map(summarize_chunk, list(enumerate(chunks)))
+
+        # Merge the partial summaries hierarchically
+        while len(summaries) > 1:
+            groups = [summaries[i:i + self.fan_in] for i in range(0, len(summaries), self.fan_in)]
+
+            def merge_group(group):
+                if len(group) == 1:
+                    return group[0]
+                prompt = (f"The following are summaries of consecutive parts of one {transcript_kind} transcript, "
+                          f"in order. Combine them into a single summary of the whole {transcript_kind}:\n\n"
+                          + "\n\n".join(group))
+                return self._generate(prompt)
+
+            summaries = self._map(merge_group, groups)
+
+        return summaries[0]
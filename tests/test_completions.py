@@ -0,0 +1,62 @@
+import threading
+
+from completions import STATUS_COMPLETE, STATUS_TIMED_OUT, CompletionRegistry
+
+
+def test_complete_runs_the_callback_once():
+    registry = CompletionRegistry(timeout=60)
+    statuses = []
+    registry.expect('bot', statuses.append)
+    assert registry.pending_count() == 1
+    assert registry.complete('bot') is True
+    assert registry.complete('bot') is False
+    assert statuses == [STATUS_COMPLETE]
+    assert registry.pending_count() == 0
+
+
+def test_complete_passes_a_custom_status():
+    registry = CompletionRegistry(timeout=60)
+    statuses = []
+    registry.expect('bot', statuses.append)
+    registry.complete('bot', 'failed')
+    assert statuses == ['failed']
+
+
+def test_unknown_bot_is_not_completed():
+    assert CompletionRegistry(timeout=60).complete('missing') is False
+
+
+def test_reaper_times_out_bots_that_never_complete():
+    registry = CompletionRegistry(timeout=60)
+    done = threading.Event()
+    statuses = []
+
+    def callback(status):
+        statuses.append(status)
+        done.set()
+
+    registry.expect('bot', callback, timeout=0.05)
+    assert done.wait(2)
+    assert statuses == [STATUS_TIMED_OUT]
+    assert registry.complete('bot') is False
+
+
+def test_reregistration_replaces_the_deadline():
+    registry = CompletionRegistry(timeout=60)
+    statuses = []
+    registry.expect('bot', statuses.append, timeout=0.05)
+    registry.expect('bot', statuses.append, timeout=60)
+    threading.Event().wait(0.2)
+    assert statuses == []
+    registry.complete('bot')
+    assert statuses == [STATUS_COMPLETE]
+
+
+def test_failing_callback_does_not_stop_the_registry():
+    registry = CompletionRegistry(timeout=60)
+
+    def broken(status):
+        raise RuntimeError('callback failed')
+
+    registry.expect('bot', broken)
+    assert registry.complete('bot') is True
@@ -0,0 +1,30 @@
+from meeting_store import MAX_BATCH_BYTES, MAX_BATCH_WRITES, chunk_lines, estimated_size, pack_batches
+
+
+def test_chunk_lines_respects_line_and_byte_limits():
+    assert list(chunk_lines(['a'] * 5, max_lines=2)) == [['a', 'a'], ['a', 'a'], ['a']]
+    chunks = list(chunk_lines(['x' * 100] * 10, max_lines=100, max_bytes=250))
+    assert all(len(chunk) == 2 for chunk in chunks)
+
+
+def test_pack_batches_splits_on_write_count():
+    writes = [(i, {'n': i}, False) for i in range(MAX_BATCH_WRITES + 10)]
+    batches = pack_batches(writes, [('summary', {}, False)])
+    assert [len(batch) for batch in batches] == [MAX_BATCH_WRITES, 11]
+    assert batches[-1][-1][0] == 'summary'
+
+
+def test_pack_batches_splits_on_payload_size():
+    # 512 KB chunks: about 20 of them used to end up in one commit over 10 MiB
+    chunk = {'index': 0, 'lines': ['x' * 1024] * 500}
+    writes = [(i, chunk, False) for i in range(24)]
+    final = [('summary', {'summary': 'x' * 1024}, False), ('latest', {'summary': 'x' * 1024}, False)]
+    batches = pack_batches(writes, final)
+    assert len(batches) > 1
+    for batch in batches:
+        assert sum(estimated_size(data) for _, data, _ in batch) <= MAX_BATCH_BYTES
+    assert [ref for ref, _, _ in batches[-1][-2:]] == ['summary', 'latest']
+
+
+def test_pack_batches_without_chunks_is_one_batch():
+    assert pack_batches([], [('summary', {}, False)]) == [[('summary', {}, False)]]
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from pipeline import StageGraph
+
+
+def test_stages_get_their_dependencies_results():
+    graph = (StageGraph('test')
+             .add('a', lambda results: 1)
+             .add('b', lambda results: results['a'] + 1, after=['a'])
+             .add('c', lambda results: results['b'] * 10, after=['b']))
+    results, timings = graph.run()
+    assert results == {'a': 1, 'b': 2, 'c': 20}
+    assert set(timings) == {'a', 'b', 'c', 'total_ms'}
+
+
+def test_independent_stages_run_in_parallel():
+    barrier = threading.Barrier(2, timeout=2)
+    graph = (StageGraph('test')
+             .add('a', lambda results: barrier.wait())
+             .add('b', lambda results: barrier.wait()))
+    # Would time out with a BrokenBarrierError if the stages ran one after the other
+    graph.run()
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError):
+        StageGraph('test').add('b', lambda results: None, after=['a'])
+
+
+def test_failure_is_raised_and_dependents_do_not_start():
+    started = []
+
+    def fail(results):
+        raise RuntimeError('stage failed')
+
+    graph = (StageGraph('test')
+             .add('a', fail)
+             .add('b', lambda results: started.append('b'), after=['a']))
+    with pytest.raises(RuntimeError, match='stage failed'):
+        graph.run()
+    assert started == []
+
+
+def test_on_start_is_called_per_stage():
+    seen = []
+    graph = StageGraph('test').add('a', lambda results: None).add('b', lambda results: None, after=['a'])
+    graph.run(on_start=seen.append)
+    assert seen == ['a', 'b']
+
+
+def test_critical_path_follows_the_slowest_dependency():
+    graph = (StageGraph('test')
+             .add('lookup', lambda results: None)
+             .add('transfer', lambda results: None, after=['lookup'])
+             .add('transcript', lambda results: None)
+             .add('save', lambda results: None, after=['transfer', 'transcript']))
+    timings = {
+        'lookup': {'start_ms': 0, 'duration_ms': 5},
+        'transfer': {'start_ms': 5, 'duration_ms': 50},
+        'transcript': {'start_ms': 0, 'duration_ms': 10},
+        'save': {'start_ms': 55, 'duration_ms': 5},
+    }
+    assert graph.critical_path(timings) == ['lookup', 'transfer', 'save']
+    assert graph.critical_path({}) == []
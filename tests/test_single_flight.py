@@ -0,0 +1,173 @@
+import threading
+import time
+
+import pytest
+
+import single_flight
+from single_flight import FirestoreLease, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return 'result'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('key', compute)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flight.do('key', compute))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ['result'] * 5
+    assert flight.in_flight() == 0
+
+
+def test_followers_get_the_leaders_exception():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError('boom')
+
+    errors = []
+
+    def call():
+        try:
+            flight.do('key', fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    leader.join()
+    follower.join()
+    assert errors == ['boom', 'boom']
+
+
+def test_finished_calls_are_not_reused():
+    flight = SingleFlight()
+    counter = iter(range(10))
+    assert flight.do('key', lambda: next(counter)) == 0
+    assert flight.do('key', lambda: next(counter)) == 1
+
+
+def test_follower_timeout():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+
+    leader = threading.Thread(target=lambda: flight.do('key', slow))
+    leader.start()
+    started.wait()
+    with pytest.raises(TimeoutError):
+        flight.do('key', slow, timeout=0.05)
+    release.set()
+    leader.join()
+
+
+class _Snapshot:
+    def __init__(self, data):
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self.exists else None
+
+
+class _Ref:
+    def __init__(self, docs, key):
+        self.docs = docs
+        self.key = key
+
+    def get(self, transaction=None):
+        return _Snapshot(self.docs.get(self.key))
+
+    def create(self, data):
+        from google.api_core.exceptions import AlreadyExists
+
+        if self.key in self.docs:
+            raise AlreadyExists(self.key)
+        self.docs[self.key] = dict(data)
+
+    def delete(self):
+        self.docs.pop(self.key, None)
+
+
+class _Transaction:
+    def set(self, ref, data):
+        ref.docs[ref.key] = dict(data)
+
+    def update(self, ref, data):
+        ref.docs[ref.key].update(data)
+
+
+class _Db:
+    # Just enough of a Firestore client for FirestoreLease
+    def __init__(self):
+        self.docs = {}
+
+    def collection(self, name):
+        return self
+
+    def document(self, key):
+        return _Ref(self.docs, key)
+
+    def transaction(self):
+        return _Transaction()
+
+
+@pytest.fixture
+def lease(monkeypatch):
+    class _Firestore:
+        @staticmethod
+        def transactional(func):
+            return func
+
+    monkeypatch.setattr(single_flight, 'firestore', _Firestore)
+    return FirestoreLease(_Db(), 'leases', ttl=0.3)
+
+
+def test_lease_has_one_owner(lease):
+    token = lease.acquire('key')
+    assert token is not None
+    assert lease.acquire('key') is None
+    lease.release('key', 'not-the-owner')
+    assert lease.acquire('key') is None
+    lease.release('key', token)
+    assert lease.acquire('key') is not None
+
+
+def test_expired_lease_is_taken_over(lease):
+    first = lease.acquire('key')
+    time.sleep(0.35)
+    second = lease.acquire('key')
+    assert second not in (None, first)
+    assert not lease.renew('key', first)
+
+
+def test_held_lease_outlives_its_ttl(lease):
+    token = lease.acquire('key')
+    with lease.hold('key', token, interval=0.05):
+        time.sleep(0.5)
+        assert lease.acquire('key') is None
+    assert lease.db.docs['key']['owner'] == token
@@ -0,0 +1,26 @@
+from summarizer import CHARS_PER_TOKEN, chunk_statements, estimate_tokens
+
+
+def test_short_transcript_is_one_chunk():
+    assert chunk_statements(['a', 'b', 'c'], max_tokens=100) == [['a', 'b', 'c']]
+
+
+def test_empty_transcript_has_no_chunks():
+    assert chunk_statements([], max_tokens=100) == []
+
+
+def test_chunks_stay_under_budget_and_keep_turns_whole():
+    statements = [f"Speaker {i % 2}: " + 'word ' * 20 for i in range(30)]
+    chunks = chunk_statements(statements, max_tokens=100)
+    assert len(chunks) > 1
+    assert [s for chunk in chunks for s in chunk] == statements
+    for chunk in chunks:
+        assert sum(estimate_tokens(s) for s in chunk) <= 100
+
+
+def test_oversized_turn_is_split_on_word_boundaries():
+    statement = ' '.join(f"w{i}" for i in range(500))
+    chunks = chunk_statements([statement], max_tokens=50)
+    pieces = [piece for chunk in chunks for piece in chunk]
+    assert ' '.join(pieces) == statement
+    assert all(len(piece) <= 50 * CHARS_PER_TOKEN for piece in pieces)
@@ -0,0 +1,43 @@
+from transcript import Utterance, api_utterances, coalesce_turns, iter_statements, webhook_utterances
+
+
+def segment(speaker, start, end, text):
+    return {'speaker': speaker, 'words': [{'word': text, 'start': start, 'end': end}]}
+
+
+def test_statements_are_ordered_by_numeric_start_time():
+    # Regression: "100.00" used to sort before "20.00" as a string
+    meeting_data = {'transcript': [
+        segment('A', 100.0, 101.0, 'late'),
+        segment('B', 20.0, 21.0, 'early'),
+        segment('A', 5.0, 6.0, 'first'),
+    ]}
+    assert list(iter_statements(webhook_utterances(meeting_data))) == [
+        "A at 5.00s :- first",
+        "B at 20.00s :- early",
+        "A at 100.00s :- late",
+    ]
+
+
+def test_segments_without_speaker_or_words_are_skipped():
+    meeting_data = {'transcript': [
+        {'speaker': None, 'words': [{'word': 'x', 'start': 0, 'end': 1}]},
+        {'speaker': 'A', 'words': []},
+        segment('A', 1.0, 2.0, 'kept'),
+    ]}
+    assert [u.text for u in webhook_utterances(meeting_data)] == ['kept']
+
+
+def test_api_utterances_read_text_and_start_time():
+    meeting_data = {'editors': [{'video': {'transcripts': [
+        {'speaker': 'A', 'words': [{'text': 'hello', 'start_time': 3, 'end_time': 4},
+                                   {'text': 'there', 'start_time': 4, 'end_time': 5}]},
+    ]}}]}
+    (utterance,) = api_utterances(meeting_data)
+    assert (utterance.start, utterance.end, utterance.text) == (3.0, 5.0, 'hello there')
+
+
+def test_coalesce_turns_joins_same_speaker_within_gap():
+    utterances = [Utterance(0, 1, 'A', 'one'), Utterance(1.5, 2, 'A', 'two'), Utterance(3, 4, 'B', 'three')]
+    assert [t.text for t in coalesce_turns(utterances, max_gap=0.0)] == ['one', 'two', 'three']
+    assert [t.text for t in coalesce_turns(utterances, max_gap=1.0)] == ['one two', 'three']
@@ -0,0 +1,106 @@
+# Meeting transcripts are normalized once into Utterance objects and only
+# turned into strings when they are stored or sent to the model.
+import heapq
+from operator import attrgetter
+
+
+class Utterance:
+    __slots__ = ('start', 'end', 'speaker', 'text')
+
+    def __init__(self, start, end, speaker, text):
+        self.start = start
+        self.end = end
+        self.speaker = speaker
+        self.text = text
+
+    def render(self):
+        return f"{self.speaker} at {self.start:.2f}s :- {self.text}"
+
+    def __repr__(self):
+        return f"Utterance({self.start!r}, {self.end!r}, {self.speaker!r}, {self.text!r})"
+
+
+def utterances_from_segments(segments, word_key='word', start_key='start', end_key='end', require_speaker=True):
+    # One pass over MeetingBaaS transcript segments ({speaker, words: [...]}).
+    # The webhook payload uses 'word'/'start'/'end'; the meeting_data API uses
+    # 'text'/'start_time'/'end_time'.
+    for segment in segments:
+        speaker = segment.get('speaker')
+        words = segment.get('words')
+        if not words or (require_speaker and not speaker):
+            continue
+
+        text = ' '.join([word[word_key] for word in words if word.get(word_key)]).strip()
+        if text:
+            start = float(words[0].get(start_key) or 0.0)
+            end = float(words[-1].get(end_key) or start)
+            yield Utterance(start, max(start, end), speaker if isinstance(speaker, str) else str(speaker), text)
+
+
+def webhook_utterances(meeting_data):
+    # Segments from the 'complete' webhook payload
+    return utterances_from_segments(meeting_data.get('transcript') or [])
+
+
+def api_utterances(meeting_data):
+    # Segments from the /bots/meeting_data API response
+    for editor in meeting_data.get('editors') or []:
+        video = editor.get('video') or {}
+        yield from utterances_from_segments(video.get('transcripts') or [], word_key='text',
+                                            start_key='start_time', end_key='end_time', require_speaker=False)
+
+
+def speaker_streams(utterances):
+    # Splits utterances into one time-ordered stream per speaker. Streams are
+    # usually already in order, so each is only sorted when it is not.
+    streams = {}
+    for utterance in utterances:
+        stream = streams.get(utterance.speaker)
+        if stream is None:
+            streams[utterance.speaker] = [utterance]
+        else:
+            stream.append(utterance)
+
+    by_start = attrgetter('start')
+    for stream in streams.values():
+        if any(stream[i].start > stream[i + 1].start for i in range(len(stream) - 1)):
+            stream.sort(key=by_start)
+    return list(streams.values())
+
+
+def merge_streams(streams):
+    # k-way merge by numeric start time; lazily yields one utterance at a time
+    return heapq.merge(*streams, key=attrgetter('start'))
+
+
+def coalesce_turns(utterances, max_gap=0.0):
+    # Joins consecutive utterances by the same speaker into one turn when the
+    # next one starts at most max_gap seconds after the previous one ended.
+    # With max_gap=0 only overlapping or touching utterances are joined.
+    turn = None
+    texts = []
+    for utterance in utterances:
+        if turn is not None and utterance.speaker == turn.speaker and utterance.start - turn.end <= max_gap:
+            texts.append(utterance.text)
+            turn.end = max(turn.end, utterance.end)
+            continue
+
+        if turn is not None:
+            turn.text = ' '.join(texts)
+            yield turn
+        turn = Utterance(utterance.start, utterance.end, utterance.speaker, utterance.text)
+        texts = [utterance.text]
+
+    if turn is not None:
+        turn.text = ' '.join(texts)
+        yield turn
+
+
+def chronological_utterances(utterances, max_gap=0.0):
+    return coalesce_turns(merge_streams(speaker_streams(utterances)), max_gap)
+
+
+def iter_statements(utterances, max_gap=0.0):
+    # Rendered transcript lines in chronological order, produced one at a time
+    for turn in chronological_utterances(utterances, max_gap):
+        yield turn.render()
@@ -0,0 +1,171 @@
+import heapq
+import logging
+import threading
+import time
+
+from clients import lazy_module
+
+logger = logging.getLogger(__name__)
+
+firestore = lazy_module('firebase_admin.firestore')
+
+# Transcripts parked by background jobs, keyed by AssemblyAI transcript id
+PENDING_TRANSCRIPTS_COLLECTION = 'pending_transcripts'
+WEBHOOK_AUTH_HEADER = 'X-AveryMeet-Webhook-Secret'
+
+# aai.TranscriptStatus values are plain strings
+STATUS_COMPLETED = 'completed'
+STATUS_ERROR = 'error'
+FINAL_STATUSES = (STATUS_COMPLETED, STATUS_ERROR)
+
+
+def _claim_in_transaction(transaction, ref):
+    # Run through firestore.transactional, which retries on contention
+    snapshot = ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return None
+    transaction.delete(ref)
+    return snapshot.to_dict()
+
+
+class TranscriptionTracker:
+    # Submits transcriptions with an AssemblyAI webhook and resumes whoever is
+    # waiting when the callback arrives. Polling with exponential backoff is
+    # kept as a fallback for missed or unconfigured webhooks. `client` is the
+    # assemblyai module (or a lazy stand-in) with its API key configured.
+    def __init__(self, db, client, webhook_url=None, webhook_secret=None, initial_poll=2.0, max_poll=30.0):
+        self.db = db
+        self.aai = client
+        if webhook_url and not webhook_secret:
+            # Anyone could post to an unauthenticated callback; poll instead
+            logger.error("ASSEMBLYAI_WEBHOOK_SECRET is required with ASSEMBLYAI_WEBHOOK_URL; "
+                         "falling back to polling")
+            webhook_url = None
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.initial_poll = initial_poll
+        self.max_poll = max_poll
+        self._waiters = {}
+        self._waiters_lock = threading.Lock()
+        self._resume_callback = None
+        self._parked = []
+        self._parked_cond = threading.Condition()
+        self._poller = None
+
+    def config(self):
+        config = self.aai.TranscriptionConfig(speaker_labels=True)
+        if self.webhook_url:
+            config.set_webhook(self.webhook_url, WEBHOOK_AUTH_HEADER, self.webhook_secret)
+        return config
+
+    def submit(self, audio):
+        # Uploads the audio and queues the transcription without waiting for it
+        transcript = self.aai.Transcriber().submit(audio, config=self.config())
+        if transcript.status == STATUS_ERROR:
+            raise RuntimeError(f"Error in transcription: {transcript.error}")
+        logger.info(f"Transcription started with ID: {transcript.id}")
+        return transcript
+
+    def get(self, transcript_id):
+        return self.aai.Transcript.get_by_id(transcript_id)
+
+    def wait(self, transcript_id, timeout=None):
+        # Blocks the caller until the transcript is final. The webhook wakes us up
+        # immediately; otherwise we poll with an exponentially growing interval.
+        event = threading.Event()
+        with self._waiters_lock:
+            self._waiters.setdefault(transcript_id, []).append(event)
+
+        deadline = time.monotonic() + timeout if timeout else None
+        delay = self.initial_poll
+        try:
+            while True:
+                woken = event.wait(delay)
+                transcript = self.get(transcript_id)
+                if transcript.status in FINAL_STATUSES:
+                    return transcript
+                if deadline and time.monotonic() >= deadline:
+                    raise TimeoutError(f"Transcription {transcript_id} did not finish in time")
+                if woken:
+                    event.clear()
+                else:
+                    logger.debug(f"Polling {transcript_id}, current status: {transcript.status}")
+                    delay = min(delay * 2, self.max_poll)
+        finally:
+            with self._waiters_lock:
+                waiters = self._waiters.get(transcript_id, [])
+                if event in waiters:
+                    waiters.remove(event)
+                if not waiters:
+                    self._waiters.pop(transcript_id, None)
+
+    def on_resume(self, callback):
+        # callback(transcript_id, context) runs once per parked transcript when it is final
+        self._resume_callback = callback
+
+    def park(self, transcript_id, context):
+        # Persist the continuation so the webhook can resume it on any instance,
+        # then schedule a local fallback poll.
+        self.db.collection(PENDING_TRANSCRIPTS_COLLECTION).document(transcript_id).set(
+            dict(context, timestamp=firestore.SERVER_TIMESTAMP))
+        self._schedule(transcript_id, self.initial_poll if not self.webhook_url else self.max_poll)
+
+    def handle_webhook(self, transcript_id):
+        # The callback body is only a hint: waiters re-read the transcript
+        # themselves, and a parked job is resumed only once AssemblyAI says it is final
+        with self._waiters_lock:
+            for event in self._waiters.get(transcript_id, []):
+                event.set()
+        if self.get(transcript_id).status in FINAL_STATUSES:
+            return self._resume(transcript_id)
+        return False
+
+    def _resume(self, transcript_id):
+        # Only one of webhook/poller/instances gets the context back
+        ref = self.db.collection(PENDING_TRANSCRIPTS_COLLECTION).document(transcript_id)
+        context = firestore.transactional(_claim_in_transaction)(self.db.transaction(), ref)
+        if context is None:
+            return False
+        context.pop('timestamp', None)
+        if self._resume_callback:
+            self._resume_callback(transcript_id, context)
+        return True
+
+    def _schedule(self, transcript_id, delay):
+        with self._parked_cond:
+            heapq.heappush(self._parked, (time.monotonic() + delay, transcript_id, delay))
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_parked, daemon=True,
+                                                name="transcript-poller")
+                self._poller.start()
+            self._parked_cond.notify()
+
+    def _poll_parked(self):
+        # Single thread polling every parked transcript on its own backoff schedule
+        while True:
+            with self._parked_cond:
+                while not self._parked or self._parked[0][0] > time.monotonic():
+                    timeout = self._parked[0][0] - time.monotonic() if self._parked else None
+                    self._parked_cond.wait(timeout)
+                _, transcript_id, delay = heapq.heappop(self._parked)
+
+            try:
+                transcript = self.get(transcript_id)
+                if transcript.status in FINAL_STATUSES:
+                    self._resume(transcript_id)
+                    continue
+            except Exception as e:
+                logger.error(f"Polling transcript {transcript_id} failed: {str(e)}")
+            self._schedule(transcript_id, min(delay * 2, self.max_poll))
+
+
+def transcript_result(transcript):
+    # Builds the speaker-labelled result returned by transcribe_audio
+    if transcript.status == STATUS_ERROR:
+        logger.error(f"Error in transcription: {transcript.error}")
+        return {"error": transcript.error}, 500
+
+    result = []
+    for utterance in transcript.utterances or []:
+        result.append(f"Speaker {utterance.speaker}: {utterance.text}")
+    return {"transcription": result}, 200